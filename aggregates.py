@@ -0,0 +1,530 @@
+# --- ROLLUP CUBE: TỔNG HỢP SẴN MỘT LẦN, CÁC TRANG CHỈ TRUY VẤN ---
+import copy
+import functools
+import threading
+from collections.abc import Mapping
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+from spatial import SPATIAL_COLUMNS, SpatialIndex
+
+CUBE_KEYS = ['country', 'event_type', 'year', 'severity', 'scale', 'response_bin']
+# Chiều & measure các trang (page_views, page_stats) đọc từ cube; year/severity chỉ dùng để lọc
+# nên cube của tập đã lọc gom bỏ hai chiều này và chỉ mang các measure dưới đây
+VIEW_KEYS = ['country', 'event_type', 'scale', 'response_bin']
+VIEW_MEASURES = ['economic_impact_million_usd', 'affected_population', 'response_time_hours',
+                 'death_rate', 'infrastructure_damage_score']
+# Thuộc tính phụ thuộc hoàn toàn vào country -> gom cùng không làm tăng số ô
+CUBE_ATTRIBUTES = ['dev_status', 'continent']
+CUBE_MEASURES = [
+    'economic_impact_million_usd', 'affected_population', 'deaths', 'injuries',
+    'response_time_hours', 'death_rate', 'injury_rate', 'infrastructure_damage_score',
+    'international_aid_million_usd',
+]
+
+
+# Các biến của heatmap tương quan (Overview)
+CORR_COLS = ['economic_impact_million_usd', 'deaths', 'injuries',
+             'affected_population', 'response_time_hours', 'international_aid_million_usd']
+# Mọi cột StreamingAggregator cần (để chỉ lấy đúng các cột này khi tổng hợp một tập dòng)
+AGGREGATE_COLUMNS = list(dict.fromkeys(CUBE_KEYS + CUBE_ATTRIBUTES + CUBE_MEASURES + CORR_COLS
+                                       + SPATIAL_COLUMNS))
+
+
+def build_rollup_cube(df, row_offset=0):
+    """Gom df theo CUBE_KEYS, mỗi measure lưu sum, sum-of-squares và số giá trị khác NaN
+    (`<m>_n`), kèm số dòng `n`.
+
+    `first_row` là vị trí dòng đầu tiên của ô trong df, dùng để giữ thứ tự
+    xuất hiện khi xếp hạng các giá trị bằng nhau (giống value_counts cũ).
+    """
+    keys = CUBE_KEYS + CUBE_ATTRIBUTES
+    work = df[keys + CUBE_MEASURES].rename(columns={m: f'{m}_sum' for m in CUBE_MEASURES})
+    work.insert(len(keys), 'n', 1)
+    for m in CUBE_MEASURES:
+        work[f'{m}_sumsq'] = np.square(df[m].to_numpy(dtype='float64'))
+        # sum() bỏ qua NaN -> mean/var phải chia cho số giá trị có thật, không phải số dòng
+        work[f'{m}_n'] = df[m].notna().to_numpy(dtype='int64')
+    work['first_row'] = np.arange(row_offset, row_offset + len(df))
+    return _sum_cells(work, keys)
+
+
+def merge_cubes(cubes):
+    """Gộp nhiều cube (vd. từ các chunk khác nhau) thành một; các measure đều cộng được."""
+    keys = CUBE_KEYS + CUBE_ATTRIBUTES
+    return _sum_cells(concat_categorical(cubes), keys)
+
+
+def _sum_cells(frame, keys):
+    # Một lượt groupby().sum() cho mọi measure + min cho first_row (nhanh hơn agg(dict) nhiều)
+    grouped = frame.groupby(keys, observed=True, sort=False)
+    sum_cols = [c for c in frame.columns if c not in keys and c != 'first_row']
+    out = grouped[sum_cols].sum()
+    out['first_row'] = grouped['first_row'].min()
+    # Ô luôn xếp theo first_row (ranked_counts dựa vào đó); sort=False đã giữ thứ tự xuất hiện
+    # nên chỉ phải sort khi gộp các cube không theo thứ tự dòng
+    if not out['first_row'].is_monotonic_increasing:
+        out = out.sort_values('first_row')
+    return out.reset_index()
+
+
+def concat_categorical(frames):
+    # Mỗi chunk có tập category riêng -> hợp nhất (sắp xếp như read_csv) trước khi concat
+    out = pd.concat(frames, ignore_index=True)
+    for col in frames[0].columns:
+        if isinstance(frames[0][col].dtype, pd.CategoricalDtype) \
+                and not isinstance(out[col].dtype, pd.CategoricalDtype):
+            out[col] = union_categoricals([f[col] for f in frames], sort_categories=True)
+    return out
+
+
+def _select_rows(frame, where):
+    # Mask các dòng (ô cube, partition...) thoả `where` {chiều: giá trị hoặc list giá trị}
+    mask = np.ones(len(frame), dtype=bool)
+    for dim, value in (where or {}).items():
+        values = list(value) if isinstance(value, (list, tuple, set)) else [value]
+        column = frame[dim]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            # Tra bảng theo mã category thay vì isin trên từng ô; ô thiếu giá trị (mã -1) rơi vào ô cuối
+            found = column.cat.categories.get_indexer(values)
+            wanted = np.zeros(len(column.cat.categories) + 1, dtype=bool)
+            wanted[found[found >= 0]] = True
+            mask &= wanted[column.array.codes]
+        else:
+            mask &= column.isin(values).to_numpy()
+    return mask
+
+
+def _group_codes(cube, dims, rows):
+    """Mã nhóm theo các chiều `dims` của các ô `rows` (None = mọi ô), -1 nếu thiếu khoá,
+    và nhãn từng chiều (chiều category giữ đủ category như observed=False)."""
+    codes = np.zeros(len(cube) if rows is None else len(rows), dtype=np.intp)
+    missing = np.zeros(len(codes), dtype=bool)
+    levels = []
+    for dim in dims:
+        column = cube[dim]
+        if isinstance(column.dtype, pd.CategoricalDtype):
+            dim_codes = column.array.codes if rows is None else column.array.codes[rows]
+            labels = pd.CategoricalIndex(column.cat.categories, dtype=column.dtype, name=dim)
+        else:
+            values = column.to_numpy()
+            dim_codes, uniques = pd.factorize(values if rows is None else values[rows], sort=True)
+            labels = pd.Index(uniques, name=dim)
+        missing |= dim_codes < 0
+        codes = codes * len(labels) + dim_codes
+        levels.append(labels)
+    codes[missing] = -1
+    return codes, levels
+
+
+def _sum_by(codes, values, size):
+    # bincount cộng trên float64; tổng số nguyên (số dòng, số người...) trả lại đúng kiểu
+    total = np.bincount(codes, weights=values, minlength=size)
+    return total.astype(values.dtype) if values.dtype.kind in 'iu' else total
+
+
+def query_cube(cube, by=None, measures=(), where=None, observed=True):
+    """Roll-up cube về các chiều `by` (None = tổng toàn bộ).
+
+    `where` là dict {chiều: giá trị hoặc list giá trị} để lọc ô trước khi gom.
+    Kết quả có `n` và với mỗi measure: `<m>_n`, `<m>_sum`, `<m>_mean`, `<m>_var`.
+    Gom bằng bincount trên mã nhóm thay cho groupby: chỉ đọc đúng các cột cần, vài ms mỗi truy vấn.
+    """
+    rows = np.flatnonzero(_select_rows(cube, where)) if where else None
+    dims = [by] if isinstance(by, str) else list(by or [])
+    codes, levels = _group_codes(cube, dims, rows)
+    if len(levels) > 1:
+        index = pd.MultiIndex.from_product(levels)
+    else:
+        index = levels[0] if levels else pd.RangeIndex(1)
+    if (codes < 0).any():
+        keep = codes >= 0
+        rows = np.flatnonzero(keep) if rows is None else rows[keep]
+        codes = codes[keep]
+
+    cols = ['n'] + [f'{m}_{s}' for m in measures for s in ('n', 'sum', 'sumsq')]
+    out = {}
+    for col in cols:
+        values = cube[col].to_numpy()
+        out[col] = _sum_by(codes, values if rows is None else values[rows], len(index))
+    if dims and observed:
+        keep = out['n'] > 0
+        index, out = index[keep], {col: values[keep] for col, values in out.items()}
+
+    # Mean/var trên mảng numpy rồi mới dựng DataFrame một lần (phép toán Series tốn vài trăm µs mỗi phép)
+    for m in measures:
+        n = out[f'{m}_n'].astype('float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            mean = out[f'{m}_sum'] / np.where(n > 0, n, np.nan)
+            out[f'{m}_mean'] = mean
+            # Phương sai mẫu (ddof=1) từ sum & sum-of-squares
+            out[f'{m}_var'] = (out[f'{m}_sumsq'] - n * mean ** 2) / np.where(n > 1, n - 1, np.nan)
+    return pd.DataFrame(out, index=index)
+
+
+def ranked_counts(cube, dim, where=None):
+    # Đếm sự kiện theo `dim`, giảm dần; bằng nhau thì giữ thứ tự xuất hiện trong dữ liệu gốc
+    counts = query_cube(cube, by=dim, where=where)['n']
+    # Ô cube xếp theo first_row -> thứ tự nhãn xuất hiện trong các ô là thứ tự trong dữ liệu gốc
+    labels = cube[dim] if not where else cube[dim][_select_rows(cube, where)]
+    first_seen = pd.Index(labels.unique()).get_indexer(counts.index)
+    counts = counts.iloc[np.argsort(first_seen, kind='stable')]
+    return counts.sort_values(ascending=False, kind='stable')
+
+
+def rollup_cube(cube, keys, measures, where=None):
+    """Cube gọn hơn: gom các ô thoả `where` về các chiều `keys` (thuộc tính theo country đi kèm),
+    chỉ giữ `n` và các cột của `measures`.
+
+    Kết quả cùng dạng cube nên query_cube/ranked_counts dùng như cũ; ô vẫn xếp theo first_row.
+    """
+    rows = np.flatnonzero(_select_rows(cube, where)) if where else np.arange(len(cube))
+    codes, _ = _group_codes(cube, keys, rows)
+    rows, codes = rows[codes >= 0], codes[codes >= 0]
+    # Ô vào đã xếp theo first_row -> đánh số ô mới theo lần xuất hiện đầu là giữ đúng thứ tự đó
+    cells = pd.factorize(codes)[0]
+    first = rows[np.flatnonzero(np.diff(np.maximum.accumulate(cells), prepend=-1) > 0)]
+    out = {col: cube[col].take(first).reset_index(drop=True) for col in keys + CUBE_ATTRIBUTES}
+    for col in ['n'] + [f'{m}_{s}' for m in measures for s in ('n', 'sum', 'sumsq')]:
+        out[col] = _sum_by(cells, cube[col].to_numpy()[rows], len(first))
+    out['first_row'] = cube['first_row'].to_numpy()[first]
+    return pd.DataFrame(out)
+
+
+# --- THỐNG KÊ THEO NHÓM (BAR/BOX PLOT VẼ TỪ BẢN TÓM TẮT, KHÔNG TỪ DỮ LIỆU THÔ) ---
+GIANTS = ['China', 'India']
+GIANT_GROUPS = ['China & India', 'Rest of World']
+
+
+def box_stats_row(x, w, whis=1.5):
+    """Thống kê box plot của một nhóm: count, mean, tứ phân vị, râu (whisker) và outlier.
+
+    `x` là các giá trị khác nhau (đã sort tăng, không NaN), `w` là số lần xuất hiện của từng giá trị.
+    Giống quy ước của matplotlib/seaborn boxplot: phân vị nội suy tuyến tính, râu là điểm dữ
+    liệu xa nhất trong khoảng whis*IQR. Outlier chỉ giữ các giá trị khác nhau (`fliers`) kèm
+    số lần (`flier_counts`) để kích thước tóm tắt không tăng theo số sự kiện.
+    """
+    row = {'count': 0, 'mean': np.nan, 'q1': np.nan, 'median': np.nan, 'q3': np.nan,
+           'whislo': np.nan, 'whishi': np.nan, 'fliers': np.array([]), 'flier_counts': np.array([], dtype=int)}
+    if not len(x):
+        return row
+    count = int(w.sum())
+    cum = np.cumsum(w)
+    pos = np.array([25, 50, 75], dtype='float64') / 100 * (count - 1)
+    lo = np.floor(pos).astype(int)
+    # Phần tử thứ k (0-based) của dãy đã sort = giá trị đầu tiên có cum > k
+    x_lo = x[np.searchsorted(cum, lo, side='right')]
+    x_hi = x[np.searchsorted(cum, np.minimum(lo + 1, count - 1), side='right')]
+    q1, median, q3 = x_lo + (x_hi - x_lo) * (pos - lo)
+    iqr = q3 - q1
+    i_lo = np.searchsorted(x, q1 - whis * iqr, side='left')
+    i_hi = np.searchsorted(x, q3 + whis * iqr, side='right')
+    row.update(
+        count=count, mean=(x * w).sum() / count, q1=q1, median=median, q3=q3,
+        whislo=x[i_lo] if i_lo < len(x) and x[i_lo] <= q1 else q1,
+        whishi=x[i_hi - 1] if i_hi > 0 and x[i_hi - 1] >= q3 else q3,
+        fliers=np.concatenate([x[:i_lo], x[i_hi:]]),
+        flier_counts=np.concatenate([w[:i_lo], w[i_hi:]]),
+    )
+    return row
+
+
+def group_stats_from_histogram(counts, values, categories, name=None, whis=1.5):
+    """box_stats_row cho từng nhóm của bảng đếm counts[nhóm, giá trị] trên `values` đã sort."""
+    rows = []
+    for group_counts in counts:
+        present = np.flatnonzero(group_counts)
+        rows.append(box_stats_row(values[present].astype('float64'), group_counts[present].astype('int64'), whis))
+    index = pd.CategoricalIndex(categories, categories=categories, name=name)
+    return pd.DataFrame(rows, index=index)
+
+
+def giant_groups(df):
+    is_giant = df['country'].isin(GIANTS).to_numpy()
+    return pd.Categorical.from_codes(np.where(is_giant, 0, 1), categories=GIANT_GROUPS)
+
+
+class LazyAggregates(Mapping):
+    """Dict aggregates ('cube', 'page_stats', 'corr', ...) mà mỗi phần chỉ được tính ở lần truy cập đầu.
+
+    Trang không cần vẽ lại box/bar plot hay heatmap (vd. ảnh đã có trong cache)
+    thì không phải trả giá cho các bảng đó. Mỗi key có lock riêng: nhiều thread
+    (session, warm-up) tính các key khác nhau song song, cùng một key chỉ tính một lần.
+    """
+
+    def __init__(self, builders):
+        self._builders = {}
+        self._locks = {}
+        self._values = {}
+        for key, build in builders.items():
+            self._add(key, build)
+
+    def _add(self, key, build):
+        self._builders[key] = build
+        self._locks[key] = threading.Lock()
+
+    def with_views(self, views):
+        """Thêm các key tính từ chính aggregates này: views = {tên: hàm(aggregates)}."""
+        for key, view in views.items():
+            self._add(key, functools.partial(view, self))
+        return self
+
+    def __getitem__(self, key):
+        if key in self._values:
+            return self._values[key]
+        with self._locks[key]:
+            if key not in self._values:
+                self._values[key] = self._builders[key]()
+            return self._values[key]
+
+    def __contains__(self, key):
+        return key in self._builders  # Không kích hoạt việc tính
+
+    def __iter__(self):
+        return iter(self._builders)
+
+    def __len__(self):
+        return len(self._builders)
+
+
+def _bar_stats(cube, by, measure, where=None):
+    # Bar plot chỉ cần count & mean -> lấy thẳng từ cube (cộng dồn được)
+    q = query_cube(cube, by=by, measures=[measure], where=where, observed=False)
+    return pd.DataFrame({'count': q[f'{measure}_n'].astype(int), 'mean': q[f'{measure}_mean']}, index=q.index)
+
+
+# --- THỐNG KÊ THEO PARTITION: GỘP ĐƯỢC, CHỌN TẬP CON KHÔNG CẦN ĐỌC LẠI DÒNG ---
+PARTITION_KEYS = ['year', 'country', 'event_type', 'severity']
+# dev_status/continent phụ thuộc hoàn toàn vào country -> đi kèm mà không tăng số partition
+PARTITION_COLUMNS = PARTITION_KEYS + CUBE_ATTRIBUTES
+# Box plot cần phân vị -> giữ histogram partition × giá trị -> số lần. response_time_hours là
+# số giờ nguyên nên histogram chỉ có vài chục cột, phân vị tính lại chính xác tuyệt đối.
+HISTOGRAM_VALUE = 'response_time_hours'
+
+
+def _partition_codes(frame, by=PARTITION_KEYS):
+    """Mã partition của từng dòng (đánh số theo thứ tự xuất hiện, -1 nếu thiếu khoá) và bảng
+    khoá PARTITION_COLUMNS một dòng mỗi partition. Ghép mã từng cột rồi factorize một lần:
+    nhanh hơn groupby(...).ngroup() nhiều cột."""
+    combined = np.zeros(len(frame))
+    for column in by:
+        codes, uniques = pd.factorize(frame[column])
+        combined = combined * (len(uniques) + 1) + np.where(codes < 0, np.nan, codes)
+    codes = pd.factorize(combined)[0]
+    # Mã mới luôn = max trước đó + 1 -> dòng đầu của mỗi partition là nơi max tích luỹ tăng
+    first = np.flatnonzero(np.diff(np.maximum.accumulate(codes), prepend=-1) > 0)
+    keys = frame[PARTITION_COLUMNS].iloc[first].reset_index(drop=True)
+    return codes, keys
+
+
+def _divide(a, b):
+    # a / b, ô có b = 0 (partition không có dòng hợp lệ) nhận 0 thay vì NaN
+    return np.divide(a, b, out=np.zeros(np.broadcast(a, b).shape), where=b > 0)
+
+
+def _group_sum(codes, n_groups, values):
+    # Cộng các phần tử [p, ...] của `values` theo nhóm codes[p]
+    if n_groups == 1:
+        return values.sum(axis=0, keepdims=True)  # Gộp tất cả (vd. corr): không cần bincount
+    flat = values.reshape(len(values), -1)
+    out = np.column_stack([np.bincount(codes, weights=flat[:, j], minlength=n_groups)
+                           for j in range(flat.shape[1])])
+    return out.reshape((n_groups,) + values.shape[1:])
+
+
+def _pair_moments(codes, n_groups, x):
+    """Moment theo partition của từng cặp cột (i, j) của x, chỉ trên các dòng có đủ x_i và x_j.
+
+    Mỗi mảng có dạng (n_groups, k, k): `n` số dòng, `mean` trung bình x_i, `cm` co-moment
+    Σ(x_i - mean[i, j])(x_j - mean[j, i]) và `m2` = Σ(x_i - mean[i, j])² trên các dòng đó.
+    """
+    k = x.shape[1]
+    valid = ~np.isnan(x)
+    n, mean, cm, m2 = (np.zeros((n_groups, k, k)) for _ in range(4))
+    if valid.all():
+        # Không thiếu giá trị: mọi cặp dùng chung tập dòng -> n, trung bình & độ lệch tính một lần
+        count = np.bincount(codes, minlength=n_groups).astype('float64')
+        means = np.column_stack([_divide(np.bincount(codes, weights=x[:, j], minlength=n_groups), count)
+                                 for j in range(k)])
+        centered = x - means[codes]
+        for i in range(k):
+            for j in range(i, k):
+                cm[:, i, j] = cm[:, j, i] = np.bincount(codes, weights=centered[:, i] * centered[:, j],
+                                                        minlength=n_groups)
+        n[:] = count[:, None, None]
+        mean[:] = means[:, :, None]
+        m2[:] = np.diagonal(cm, axis1=1, axis2=2)[:, :, None]
+        return n, mean, cm, m2
+
+    for i in range(k):
+        for j in range(i, k):
+            rows = valid[:, i] & valid[:, j]
+            c = codes[rows]
+            count = np.bincount(c, minlength=n_groups).astype('float64')
+            mi = _divide(np.bincount(c, weights=x[rows, i], minlength=n_groups), count)
+            mj = _divide(np.bincount(c, weights=x[rows, j], minlength=n_groups), count)
+            di, dj = x[rows, i] - mi[c], x[rows, j] - mj[c]
+            n[:, i, j] = n[:, j, i] = count
+            mean[:, i, j], mean[:, j, i] = mi, mj
+            cm[:, i, j] = cm[:, j, i] = np.bincount(c, weights=di * dj, minlength=n_groups)
+            m2[:, i, j] = np.bincount(c, weights=di * di, minlength=n_groups)
+            m2[:, j, i] = np.bincount(c, weights=dj * dj, minlength=n_groups)
+    return n, mean, cm, m2
+
+
+def _merge_moments(codes, n_groups, n, mean, cm, m2):
+    """Gộp moment từng cặp cột (dạng _pair_moments) của nhiều phần theo `codes` bằng công thức Chan."""
+    total = _group_sum(codes, n_groups, n)
+    grand_mean = _divide(_group_sum(codes, n_groups, n * mean), total)
+    delta = mean - grand_mean[codes]
+    cm = _group_sum(codes, n_groups, cm + n * delta * delta.transpose(0, 2, 1))
+    m2 = _group_sum(codes, n_groups, m2 + n * delta * delta)
+    return total, grand_mean, cm, m2
+
+
+class PartitionedStats:
+    """Thống kê cộng dồn theo partition (PARTITION_KEYS).
+
+    Mỗi partition giữ n, trung bình và co-moment của từng cặp cột CORR_COLS trên
+    các dòng có đủ cả hai giá trị (pairwise như DataFrame.corr; gộp theo công
+    thức Chan, ổn định số học hơn tổng bình phương thô) và một dòng của `histogram`:
+    số lần gặp từng giá trị response_time_hours trong `values` (đã sort). Cộng thêm chunk
+    mới (`merge`) hay chọn tập partition theo bộ lọc (`select`) đều chỉ tốn O(số partition).
+    """
+
+    def __init__(self, keys, n, mean, cm, m2, values, histogram):
+        self.keys = keys
+        self.n = n
+        self.mean = mean
+        self.cm = cm
+        self.m2 = m2
+        self.values = values
+        self.histogram = histogram
+
+    @classmethod
+    def from_rows(cls, df):
+        codes, keys = _partition_codes(df)
+        value_codes, values = pd.factorize(df[HISTOGRAM_VALUE], sort=True)
+        valid = (codes >= 0) & (value_codes >= 0)
+        histogram = np.bincount(codes[valid] * len(values) + value_codes[valid],
+                                minlength=len(keys) * len(values)).reshape(len(keys), len(values))
+        keep = codes >= 0
+        x = df[CORR_COLS].to_numpy(dtype='float64')[keep]
+        return cls(keys, *_pair_moments(codes[keep], len(keys), x), np.asarray(values), histogram)
+
+    @classmethod
+    def merge(cls, parts):
+        parts = [p for p in parts if p is not None]
+        keys = concat_categorical([p.keys for p in parts])
+        codes, merged_keys = _partition_codes(keys)
+        n, mean, cm, m2 = _merge_moments(codes, len(merged_keys), *(
+            np.concatenate([getattr(p, name) for p in parts]) for name in ('n', 'mean', 'cm', 'm2')
+        ))
+        # Đưa histogram của từng phần về chung tập giá trị rồi cộng theo partition đã gộp
+        values = np.unique(np.concatenate([p.values for p in parts]))
+        histogram = np.zeros((len(keys), len(values)), dtype='int64')
+        offsets = np.cumsum([0] + [len(p.keys) for p in parts])
+        for p, start, stop in zip(parts, offsets[:-1], offsets[1:]):
+            histogram[start:stop, np.searchsorted(values, p.values)] = p.histogram
+        histogram = _group_sum(codes, len(merged_keys), histogram).astype('int64')
+        return cls(merged_keys, n, mean, cm, m2, values, histogram)
+
+    def select(self, where):
+        """Chỉ giữ các partition thoả `where` ({cột PARTITION_COLUMNS: giá trị/list})."""
+        mask = _select_rows(self.keys, where)
+        return PartitionedStats(self.keys[mask].reset_index(drop=True), self.n[mask], self.mean[mask],
+                                self.cm[mask], self.m2[mask], self.values, self.histogram[mask])
+
+    def corr(self):
+        """Ma trận Pearson của CORR_COLS trên mọi partition đang giữ (mỗi cặp: các dòng có đủ hai giá trị)."""
+        _, _, cm, m2 = _merge_moments(np.zeros(len(self.n), dtype=int), 1, self.n, self.mean, self.cm, self.m2)
+        cm, m2 = cm[0], m2[0]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            corr = cm / np.sqrt(m2 * m2.T)
+        return pd.DataFrame(corr, index=CORR_COLS, columns=CORR_COLS)
+
+    def box_stats(self, groups, categories, name):
+        # Box plot response_time_hours theo `groups` (một nhãn mỗi partition, cùng thứ tự keys)
+        group_codes = pd.Categorical(groups, categories=categories).codes
+        # Vài nhóm × vài chục giá trị: nhân ma trận one-hot nhanh hơn bincount từng cột (mã -1 tự bị loại)
+        one_hot = (np.arange(len(categories))[:, None] == group_codes).astype('float64')
+        counts = one_hot @ self.histogram
+        return group_stats_from_histogram(counts, self.values, categories, name)
+
+
+# --- CHẾ ĐỘ STREAMING: CỘNG DỒN THEO CHUNK, CHỈ GIỮ CÁC BẢNG TỔNG HỢP ---
+class StreamingAggregator:
+    """Cập nhật dần cube, thống kê theo partition và chỉ mục không gian theo từng chunk đã có feature.
+
+    Không giữ dòng dữ liệu thô nào; bộ nhớ chỉ phụ thuộc số ô của cube/partition/lưới.
+    """
+
+    def __init__(self):
+        self.rows = 0
+        self.cube = None
+        self.partitions = None
+        self.spatial = None
+
+    def update(self, chunk):
+        partial = build_rollup_cube(chunk, row_offset=self.rows)
+        self.cube = partial if self.cube is None else merge_cubes([self.cube, partial])
+        part = PartitionedStats.from_rows(chunk)
+        self.partitions = part if self.partitions is None else PartitionedStats.merge([self.partitions, part])
+        self.spatial = SpatialIndex.merge([self.spatial, SpatialIndex.from_rows(chunk)])
+        self.rows += len(chunk)
+
+    def copy(self):
+        # update() thay mới cube/partitions/spatial (không sửa tại chỗ) -> bản sao nông đã độc lập
+        return copy.copy(self)
+
+    def result(self):
+        # cube/partitions/spatial được thay mới ở mỗi update() nên kết quả đã trả về không đổi theo
+        return aggregates_from(self.cube, self.partitions, self.spatial)
+
+
+def _page_stats(cube, partitions):
+    rest = [c for c in cube['country'].cat.categories if c not in GIANTS]
+    keys = partitions.keys
+    return {
+        'death_rate_by_response_bin': _bar_stats(cube, 'response_bin', 'death_rate'),
+        'response_by_scale': _bar_stats(cube, 'scale', 'response_time_hours'),
+        'death_rate_by_scale': _bar_stats(cube, 'scale', 'death_rate'),
+        'response_by_scale_rest': _bar_stats(cube, 'scale', 'response_time_hours',
+                                             where={'country': rest}),
+        'response_by_dev_status': partitions.box_stats(
+            keys['dev_status'], cube['dev_status'].cat.categories, 'dev_status'
+        ),
+        'response_by_giant_group': partitions.box_stats(giant_groups(keys), GIANT_GROUPS, 'group'),
+    }
+
+
+# Bảng tóm tắt tính từ 'cube'/'partitions' của chính aggregates (toàn bộ hay tập con đều dùng)
+_SUMMARY_VIEWS = {
+    'page_stats': lambda aggregates: _page_stats(aggregates['cube'], aggregates['partitions']),
+    'corr': lambda aggregates: aggregates['partitions'].corr(),
+}
+
+
+def aggregates_from(cube, partitions, spatial=None):
+    """LazyAggregates ('cube', 'partitions', 'page_stats', 'corr'[, 'spatial']) từ các bảng tổng hợp của cùng một tập dòng."""
+    builders = {'cube': lambda: cube, 'partitions': lambda: partitions}
+    if spatial is not None:
+        builders['spatial'] = lambda: spatial
+    return LazyAggregates(builders).with_views(_SUMMARY_VIEWS)
+
+
+def restrict_aggregates(aggregates, where):
+    """Aggregates của tập dòng thoả `where` chỉ bằng cách chọn ô cube & partition, không đọc lại dòng.
+
+    `where` chỉ được lọc trên PARTITION_COLUMNS (các cột này đều là chiều của cube).
+    Cube của kết quả chỉ còn các chiều VIEW_KEYS và measure VIEW_MEASURES (ít ô hơn nhiều -> các
+    view truy vấn nhanh). Cube & partition của tập con chỉ được tính khi trang cần tới (trang không
+    vẽ heatmap/box plot thì không phải chọn partition). Lưới không gian không chia theo partition
+    nên kết quả không có 'spatial'.
+    """
+    return LazyAggregates({
+        'cube': lambda: rollup_cube(aggregates['cube'], VIEW_KEYS, VIEW_MEASURES, where),
+        'partitions': lambda: aggregates['partitions'].select(where),
+    }).with_views(_SUMMARY_VIEWS)
@@ -1,9 +1,21 @@
+import os
+import time
+
 import streamlit as st
 import pandas as pd
-import numpy as np
-import matplotlib.pyplot as plt
-import seaborn as sns
-import plotly.express as px
+
+from aggregates import PARTITION_COLUMNS, restrict_aggregates
+from charts import barplot_from_stats, boxplot_from_stats, top_n_points, top_n_with_other
+from data_pipeline import DATA_FILE
+from data_store import DataService, DataStore
+from figure_cache import FigureCache
+from filters import FilterEngine, active_filters, partition_where
+from page_views import with_page_views
+from perf import METRICS, PROFILERS, ProfileCapture, RerunProfile, peak_rss_bytes, rss_bytes
+from spatial import SPATIAL_COLUMNS, SpatialIndex, cell_size
+
+# Thời gian & bộ nhớ từng bước của lần chạy này (benchmarks/bench_pages.py đọc qua session_state)
+profile = RerunProfile()
 
 # --- 1. CẤU HÌNH TRANG & STYLE ---
 st.set_page_config(
@@ -83,68 +95,180 @@ with st.sidebar:
     st.info("**Project:** Global Climate Impact\n\n**Data:** 2020-2025\n\n**Status:** Strategic Analysis")
 
 # --- 2. XỬ LÝ DỮ LIỆU (GIỮ NGUYÊN LOGIC CỦA BẠN) ---
-@st.cache_data
-def load_and_process_data():
-    try:
-        df = pd.read_csv('global_climate_events_economic_impact_2020_2025.csv')
-    except FileNotFoundError:
-        st.error("⚠️ Không tìm thấy file dữ liệu. Vui lòng kiểm tra lại.")
+# > 0: đọc CSV theo chunk và chỉ giữ bảng tổng hợp (dữ liệu lớn hơn RAM)
+CHUNK_ROWS = int(os.environ.get('DASHBOARD_CHUNK_ROWS', '0'))
+# Số thread tính trước aggregates của mọi trang khi nạp/làm mới dữ liệu (<= 1: tính khi trang cần)
+WARMUP_WORKERS = int(os.environ.get('DASHBOARD_WARMUP_WORKERS', os.cpu_count() or 1))
+# Đổi file nguồn (vd. dữ liệu giả lập của benchmark) mà không sửa code
+DATA_PATH = os.environ.get('DASHBOARD_DATA_FILE', DATA_FILE)
+# Bảng thời gian từng bước ở sidebar (chỉ bật phía server, người xem không tự bật được qua URL)
+DEBUG = os.environ.get('DASHBOARD_DEBUG') == '1'
+# Ghi bộ đếm dạng Prometheus ra file sau mỗi lần chạy (textfile collector)
+METRICS_FILE = os.environ.get('DASHBOARD_METRICS_FILE')
+# 0: RowStore giữ nguyên kiểu int64 và các cột tỉ lệ (so sánh bộ nhớ với chế độ gọn mặc định)
+COMPACT = os.environ.get('DASHBOARD_COMPACT', '1') != '0'
+# Chu kỳ (giây) thread nền tự kiểm tra file nguồn; mỗi lần rerun cũng đánh thức nó
+REFRESH_SECONDS = float(os.environ.get('DASHBOARD_REFRESH_SECONDS', '60'))
+# Chu kỳ cập nhật dòng trạng thái "độ mới" của dữ liệu ở sidebar (chỉ chạy lại fragment đó)
+FRESHNESS_SECONDS = 10
+
+# Chỉ giữ một service: đổi cấu hình (khoá cache) thì service cũ bị loại và dừng thread/thread pool
+@st.cache_resource(max_entries=1, on_release=DataService.stop)
+def get_data_service(csv_path, chunk_rows, warmup_workers, compact, refresh_seconds):
+    # Một kho cho mỗi file nguồn, nạp & làm mới trên thread nền; script chỉ đọc snapshot
+    store = DataStore(csv_path, chunk_rows=chunk_rows or None, warmup_workers=warmup_workers, compact=compact)
+    return DataService(store, interval=refresh_seconds)
+
+def format_age(seconds):
+    if seconds < 60:
+        return f"{seconds:.0f} giây"
+    if seconds < 3600:
+        return f"{seconds / 60:.0f} phút"
+    return f"{seconds / 3600:.1f} giờ"
+
+@st.fragment(run_every=FRESHNESS_SECONDS)
+def render_freshness(service, shown):
+    # `shown`: snapshot trang đang hiển thị; snapshot mới hơn chỉ được dùng khi cả trang chạy lại
+    built = time.strftime('%H:%M:%S', time.localtime(shown.built_at))
+    st.caption(f"🕒 Dữ liệu lúc {built} ({format_age(time.time() - shown.built_at)} trước)"
+               + (f" · kiểm tra nguồn {format_age(time.time() - service.checked_at)} trước"
+                  if service.checked_at else ""))
+    if service.refreshing:
+        st.caption("🔄 Đang làm mới dữ liệu ở nền...")
+    if service.error is not None:
+        st.warning(f"⚠️ Làm mới thất bại, đang dùng dữ liệu cũ: {service.error}")
+    latest = service.snapshot
+    if latest is not None and latest.version != shown.version:
+        if st.button(f"🆕 Có dữ liệu mới ({latest.rows:,} sự kiện) - tải lại", key="load_latest"):
+            st.rerun()
+
+def load_snapshot():
+    service = get_data_service(DATA_PATH, CHUNK_ROWS, WARMUP_WORKERS, COMPACT, REFRESH_SECONDS)
+    with profile.span('refresh', 'load'):
+        # Không chờ làm mới: dùng snapshot tốt gần nhất, thread nền kiểm tra file nguồn
+        service.request_refresh()
+        snapshot = service.snapshot
+        if snapshot is None:
+            with st.spinner("⏳ Đang nạp dữ liệu lần đầu..."):
+                snapshot = service.wait_first()
+    if snapshot is None:
+        if isinstance(service.error, FileNotFoundError):
+            st.error("⚠️ Không tìm thấy file dữ liệu. Vui lòng kiểm tra lại.")
+        else:
+            st.error(f"⚠️ Không nạp được dữ liệu: {service.error}")
         return None
+    with st.sidebar:
+        render_freshness(service, snapshot)
+    return snapshot
+
+@st.cache_resource
+def get_figure_cache():
+    # Dùng chung cho mọi session; giới hạn 64MB ảnh PNG
+    return FigureCache(max_bytes=64 * 1024 * 1024)
+
+def show_figure(chart_id, draw, **params):
+    # Vẽ lại chỉ khi (chart, data version, bộ lọc, tham số) chưa có trong cache
+    key = (chart_id, data_version, view_key, tuple(sorted(params.items())))
+    with profile.span(chart_id, 'render'):
+        image = get_figure_cache().get_or_render(key, draw)
+    st.image(image, use_container_width=True)
+    profile.lap(chart_id)
+
+def show_plotly(chart_id, fig):
+    with profile.span(chart_id, 'serialize'):
+        st.plotly_chart(fig, use_container_width=True)
+    profile.lap(chart_id)
+
+# --- BỘ LỌC (SIDEBAR) ---
+FILTER_LABELS = {
+    'country': "🌐 Quốc gia",
+    'event_type': "🌪️ Loại thiên tai",
+    'dev_status': "🏛️ Nhóm phát triển",
+    'continent': "🗺️ Châu lục",
+    'year': "📅 Năm",
+    'severity': "⚠️ Mức độ (severity)",
+}
 
-    # Basic Cleaning
-    df['date'] = pd.to_datetime(df['date'])
-    df['year'] = df['year'].astype(int)
-    
-    # Features
-    developed_countries = [
-        'United States', 'Japan', 'Germany', 'United Kingdom', 'France', 'Italy', 'Canada',
-        'Australia', 'South Korea', 'Netherlands', 'Switzerland', 'Sweden', 'Belgium',
-        'Austria', 'Denmark', 'Finland', 'Norway', 'Ireland', 'New Zealand', 'Singapore'
-    ]
-    df['is_developed'] = df['country'].isin(developed_countries)
-    df['dev_status'] = df['is_developed'].map({True: 'Developed', False: 'Developing'})
-
-    bins_resp = [0, 12, 24, np.inf]
-    labels_resp = ['<12h (Nhanh)', '12-24h (Trung bình)', '>24h (Chậm)']
-    df['response_bin'] = pd.cut(df['response_time_hours'], bins=bins_resp, labels=labels_resp, include_lowest=True)
-
-    df['death_rate'] = (df['deaths'] / df['affected_population']) * 100
-    df['injury_rate'] = (df['injuries'] / df['affected_population']) * 100
-
-    def get_continent(country):
-        asia = ['China', 'India', 'Japan', 'South Korea', 'Indonesia', 'Philippines', 'Vietnam', 'Thailand', 'Singapore']
-        europe = ['Germany', 'United Kingdom', 'France', 'Italy', 'Netherlands', 'Switzerland', 'Sweden', 'Belgium', 'Austria', 'Poland']
-        americas = ['United States', 'Canada', 'Brazil', 'Mexico', 'Argentina']
-        africa = ['Nigeria', 'Egypt', 'South Africa', 'Kenya', 'Ethiopia']
-        if country in asia: return 'Asia'
-        if country in europe: return 'Europe'
-        if country in americas: return 'Americas'
-        if country in africa: return 'Africa'
-        return 'Other'
-    
-    df['continent'] = df['country'].apply(get_continent)
-    bins_pop = [0, 100000, 1000000, 5000000, df['affected_population'].max()+1]
-    labels_pop = ['<100k', '100k–1M', '1M–5M', '>5M (Mega-event)']
-    df['scale'] = pd.cut(df['affected_population'], bins=bins_pop, labels=labels_pop)
-    df['log_impact'] = np.log1p(df['economic_impact_million_usd'])
-
-    return df
+@st.cache_resource(max_entries=2)
+def get_filter_engine(_table, data_version):
+    # Bitmap index theo từng giá trị, build một lần mỗi data version
+    return FilterEngine(_table)
+
+@st.cache_resource(max_entries=64)
+def get_filtered_aggregates(_table, _engine, _aggregates, data_version, filters):
+    # cache_resource: LazyAggregates không pickle được; kết quả chỉ đọc nên dùng chung được
+    # Mọi cột lọc đều là chiều partition (năm/quốc gia/loại/severity...): gộp ô cube & partition, không đọc dòng
+    restricted = restrict_aggregates(_aggregates, partition_where(dict(filters), _engine, PARTITION_COLUMNS))
+    # Lưới không gian không chia theo partition: build từ các dòng đã lọc khi trang cần tới
+    restricted.with_views({'spatial': lambda _: SpatialIndex.from_rows(
+        _table.take(_engine.select(dict(filters)), SPATIAL_COLUMNS)
+    )})
+    return int(restricted['cube']['n'].sum()), with_page_views(restricted)
+
+def render_filters(engine):
+    selection = {}
+    with st.sidebar:
+        st.markdown("---")
+        st.markdown("### 🔎 Bộ lọc")
+        for column in ['country', 'event_type', 'dev_status', 'continent']:
+            selection[column] = st.multiselect(FILTER_LABELS[column], engine.options(column),
+                                               key=f"filter_{column}", placeholder="Tất cả")
+        for column in ['year', 'severity']:
+            low, high = engine.bounds(column)
+            if low < high:
+                selection[column] = st.slider(FILTER_LABELS[column], low, high, (low, high),
+                                              key=f"filter_{column}")
+    return selection
+
+snapshot = load_snapshot()
+if snapshot is not None:
+    data_version = snapshot.version
+    aggregates = snapshot.aggregates
+    view_key = ()
+    if snapshot.has_rows:
+        with profile.span('filter_index', 'aggregate'):
+            engine = get_filter_engine(snapshot.table, data_version)
+            filters = active_filters(render_filters(engine), engine)
+        if filters:
+            # Trang nhận aggregates của tập dòng đã lọc (cache theo data version + bộ lọc)
+            view_key = tuple(sorted(filters.items()))
+            with profile.span('filtered_aggregates', 'aggregate'):
+                n_selected, aggregates = get_filtered_aggregates(
+                    snapshot.table, engine, snapshot.aggregates, data_version, view_key
+                )
+            st.sidebar.caption(f"Đang xem {n_selected:,} / {snapshot.rows:,} sự kiện")
+            if n_selected == 0:
+                st.warning("⚠️ Không có sự kiện nào khớp bộ lọc hiện tại.")
+                st.stop()
+    else:
+        st.sidebar.caption("Bộ lọc không khả dụng ở chế độ streaming (DASHBOARD_CHUNK_ROWS).")
+    profile.lap('load')
 
-df = load_and_process_data()
+def view(name):
+    # Bảng tổng hợp của trang (page_views); đã warm-up thì chỉ là tra cứu
+    with profile.span(name, 'aggregate'):
+        return aggregates[name]
 
 # --- 3. HÀM RENDER CÁC TRANG ---
+# matplotlib/seaborn/plotly chỉ được import khi một trang thật sự vẽ tới (khởi động nhanh hơn)
+def new_figure(**kwargs):
+    import matplotlib.pyplot as plt
+    return plt.subplots(**kwargs)
 
 def render_overview():
+    import plotly.express as px
+
     st.markdown("# 🌍 Global Climate Impact Dashboard")
     st.markdown("### *Chiến lược Ứng phó Thiên tai dựa trên Dữ liệu Thực tế (2020-2025)*")
     st.markdown("---")
     
     # --- KPI CARDS (ĐÃ CÓ CSS ĐẸP) ---
+    totals = view('kpi_totals')
     k1, k2, k3, k4 = st.columns(4)
-    k1.metric("🌪️ Tổng Sự Kiện", f"{len(df):,}")
-    k2.metric("💸 Tổng Thiệt Hại", f"${df['economic_impact_million_usd'].sum():,.0f} M")
-    k3.metric("👥 Người bị ảnh hưởng", f"{df['affected_population'].sum():,.0f}")
-    k4.metric("🚑 Tốc độ Ứng phó TB", f"{df['response_time_hours'].mean():.1f} giờ")
+    k1.metric("🌪️ Tổng Sự Kiện", f"{int(totals['n']):,}")
+    k2.metric("💸 Tổng Thiệt Hại", f"${totals['economic_impact_million_usd_sum']:,.0f} M")
+    k3.metric("👥 Người bị ảnh hưởng", f"{totals['affected_population_sum']:,.0f}")
+    k4.metric("🚑 Tốc độ Ứng phó TB", f"{totals['response_time_hours_mean']:.1f} giờ")
     
     st.markdown("<br>", unsafe_allow_html=True)
     
@@ -153,10 +277,10 @@ def render_overview():
     col1, col2 = st.columns([3, 2])
     
     with col1:
-        country_map_data = df.groupby('country').agg({
-            'economic_impact_million_usd': 'sum',
-            'event_id': 'count'
-        }).reset_index()
+        country_map_data = view('impact_by_country').reset_index().rename(columns={
+            'economic_impact_million_usd_sum': 'economic_impact_million_usd',
+            'n': 'event_id'
+        })[['country', 'economic_impact_million_usd', 'event_id']]
         
         fig_map = px.choropleth(
             country_map_data,
@@ -170,15 +294,40 @@ def render_overview():
             projection="natural earth"
         )
         fig_map.update_layout(margin={"r":0,"t":40,"l":0,"b":0}, paper_bgcolor="rgba(0,0,0,0)")
-        st.plotly_chart(fig_map, use_container_width=True)
+        show_plotly('overview_map', fig_map)
         
     with col2:
-        event_counts = df['event_type'].value_counts().reset_index()
+        event_counts = view('event_type_counts').reset_index()
         event_counts.columns = ['Loại', 'Số lượng']
+        event_counts = top_n_with_other(event_counts, 'Loại', 'Số lượng')
         fig_bar = px.bar(event_counts, x='Số lượng', y='Loại', orientation='h', 
                          title="<b>Tần suất Loại thiên tai</b>", color='Số lượng', color_continuous_scale='Blues')
         fig_bar.update_layout(paper_bgcolor="rgba(0,0,0,0)")
-        st.plotly_chart(fig_bar, use_container_width=True)
+        show_plotly('overview_event_types', fig_bar)
+
+    # Drill-down theo vị trí sự kiện: chỉ lấy các ô lưới nằm trong khung nhìn đã chọn
+    if st.toggle("🗺️ Xem mật độ sự kiện theo vị trí (lat/long)", key="density_map"):
+        v1, v2 = st.columns(2)
+        lat_range = v1.slider("Vĩ độ", -90.0, 90.0, (-90.0, 90.0), step=0.5, key="viewport_lat")
+        lon_range = v2.slider("Kinh độ", -180.0, 180.0, (-180.0, 180.0), step=0.5, key="viewport_lon")
+        if (lat_range, lon_range) == ((-90.0, 90.0), (-180.0, 180.0)):
+            zoom, cells = view('world_density')
+        else:
+            with profile.span('viewport_density', 'aggregate'):
+                index = aggregates['spatial']
+                zoom = index.zoom_for(lat_range, lon_range)
+                cells = index.query(lat_range, lon_range, zoom=zoom)
+        fig_density = px.scatter_geo(
+            cells, lat='latitude', lon='longitude', size='count', color='economic_impact_million_usd',
+            hover_data=['count', 'deaths'], color_continuous_scale='Reds', projection='natural earth',
+            title="<b>Mật độ sự kiện & thiệt hại theo ô lưới</b>",
+            labels={'count': 'Số sự kiện', 'deaths': 'Tử vong',
+                    'economic_impact_million_usd': 'Thiệt hại (Triệu USD)'},
+        )
+        fig_density.update_geos(lataxis_range=list(lat_range), lonaxis_range=list(lon_range))
+        fig_density.update_layout(margin={"r":0,"t":40,"l":0,"b":0}, paper_bgcolor="rgba(0,0,0,0)")
+        st.caption(f"Lưới mức {zoom} (ô {cell_size(zoom):g}°): {len(cells):,} ô có sự kiện trong khung nhìn")
+        show_plotly('overview_density', fig_density)
 
     st.markdown("<br>", unsafe_allow_html=True)
 
@@ -187,7 +336,7 @@ def render_overview():
     c3, c4 = st.columns(2)
     
     with c3:
-        top15 = df['country'].value_counts().head(15).reset_index()
+        top15 = view('country_counts').head(15).reset_index()
         top15.columns = ['Quốc gia', 'Số sự kiện']
         fig_top15 = px.bar(
             top15, x='Số sự kiện', y='Quốc gia', orientation='h', 
@@ -195,17 +344,17 @@ def render_overview():
             title="<b>Top 15 Quốc gia có tần suất cao nhất</b>"
         )
         fig_top15.update_layout(yaxis={'categoryorder':'total ascending'}, paper_bgcolor="rgba(0,0,0,0)")
-        st.plotly_chart(fig_top15, use_container_width=True)
+        show_plotly('overview_top15', fig_top15)
 
     with c4:
         st.markdown("**Heatmap Tương Quan (Pearson)**")
-        key_cols = ['economic_impact_million_usd', 'deaths', 'injuries', 
-                    'affected_population', 'response_time_hours', 'international_aid_million_usd']
-        corr_matrix = df[key_cols].corr()
-        fig_corr, ax = plt.subplots(figsize=(8, 6))
-        sns.heatmap(corr_matrix, annot=True, cmap='coolwarm', fmt='.2f', linewidths=.5, ax=ax)
-        ax.set_title("Correlation Matrix", fontsize=14)
-        st.pyplot(fig_corr)
+        def draw_corr():
+            import seaborn as sns
+            fig_corr, ax = new_figure(figsize=(8, 6))
+            sns.heatmap(aggregates['corr'], annot=True, cmap='coolwarm', fmt='.2f', linewidths=.5, ax=ax)
+            ax.set_title("Correlation Matrix", fontsize=14)
+            return fig_corr
+        show_figure('overview_corr', draw_corr)
 
     st.markdown("---")
 
@@ -226,14 +375,17 @@ def render_overview():
             navigate_to('BQ1')
 
 def render_bq1():
+    import plotly.express as px
+
     st.markdown("# ⚡ BQ1: Response time có ảnh hưởng đến số lượng người chết và bị thương không? Ảnh hưởng như thế nào? Và sự khác biệt địa lý giữa nước đã & đang phát triển là gì?")
     st.markdown("""
     <br>
     """, unsafe_allow_html=True)
     
     # Tính toán
-    avg_death_fast = df[df['response_time_hours'] <= 24]['death_rate'].mean()
-    avg_death_slow = df[df['response_time_hours'] > 24]['death_rate'].mean()
+    # <=24h tương ứng đúng 2 nhóm response_bin đầu tiên
+    death_rates = view('death_rate_fast_slow')
+    avg_death_fast, avg_death_slow = death_rates['fast'], death_rates['slow']
     if avg_death_fast == 0: avg_death_fast = 0.000001 
     diff_percent = ((avg_death_slow - avg_death_fast) / avg_death_fast) * 100
 
@@ -241,10 +393,12 @@ def render_bq1():
     st.subheader("📌 DQ1.1: Tốc độ ứng phó ảnh hưởng thế nào đến tỷ lệ tử vong?'")
     c1, c2 = st.columns([1, 1])
     with c1:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.barplot(data=df, x='response_bin', y='death_rate', palette='Reds', ci=None, ax=ax)
-        ax.set_title("Tỷ lệ Tử vong (%) theo Tốc độ Ứng phó", fontweight='bold')
-        st.pyplot(fig)
+        def draw_death_by_response():
+            fig, ax = new_figure(figsize=(8, 5))
+            barplot_from_stats(ax, aggregates['page_stats']['death_rate_by_response_bin'], 'response_bin', 'death_rate', 'Reds')
+            ax.set_title("Tỷ lệ Tử vong (%) theo Tốc độ Ứng phó", fontweight='bold')
+            return fig
+        show_figure('bq1_death_by_response', draw_death_by_response)
     with c2:
         st.success(f"""
         **✅ Bằng chứng Dữ liệu:**
@@ -259,19 +413,24 @@ def render_bq1():
     c3, c4 = st.columns(2)
     with c3:
         st.subheader("📌 DQ1.2: Các nước giàu (Developed) có thực sự làm tốt hơn nước nghèo?")
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.boxplot(data=df, x='dev_status', y='response_time_hours', palette='Set2', ax=ax)
-        ax.set_title("Tốc độ: Developing NHANH HƠN Developed", fontweight='bold')
-        st.pyplot(fig)
+        def draw_response_by_dev():
+            fig, ax = new_figure(figsize=(8, 5))
+            boxplot_from_stats(ax, aggregates['page_stats']['response_by_dev_status'], 'Set2', 'dev_status', 'response_time_hours')
+            ax.set_title("Tốc độ: Developing NHANH HƠN Developed", fontweight='bold')
+            return fig
+        show_figure('bq1_response_by_dev', draw_response_by_dev)
         st.error("**Nghịch lý:** Nước phát triển (Developed) phản ứng trung bình chậm hơn nước đang phát triển, và khi chậm thì hậu quả nghiêm trọng hơn.")
 
     with c4:
         st.subheader("📌 DQ1.3: Phản ứng nhanh có cứu được cơ sở hạ tầng (nhà cửa, cầu đường) không?")
-        infra_trend = df.groupby('response_bin')['infrastructure_damage_score'].mean().reset_index()
+        infra_trend = view('infra_by_response_bin').reset_index()
+        infra_trend = infra_trend.rename(columns={
+            'infrastructure_damage_score_mean': 'infrastructure_damage_score'
+        })[['response_bin', 'infrastructure_damage_score']]
         fig = px.line(infra_trend, x='response_bin', y='infrastructure_damage_score', markers=True,
                       title="<b>Điểm Thiệt hại Hạ tầng (0-10) theo Tốc độ</b>",
                       labels={'infrastructure_damage_score': 'Avg Damage Score'})
-        st.plotly_chart(fig, use_container_width=True)
+        show_plotly('bq1_infra_trend', fig)
         st.warning("**Insight:** Tốc độ nhanh KHÔNG cứu được hạ tầng (Đường biểu đồ đi ngang). Hạ tầng thường sập ngay lập tức, cứu hộ chỉ cứu được người.")
 
     # ACTION BOX
@@ -289,6 +448,8 @@ def render_bq1():
             navigate_to('BQ2')
 
 def render_bq2():
+    import plotly.express as px
+
     st.markdown("# BQ2: Tỷ lệ tử vong và response time ảnh hưởng thế nào đến các sự kiện lớn/nhỏ? Liệu có theo triết lý thông thường “càng nhỏ càng dễ phản ứng”? (Scale Paradox)")
     st.markdown("""
     <br>
@@ -297,27 +458,30 @@ def render_bq2():
     st.subheader("📌 DQ2.1 & DQ2.2: Quy mô ảnh hưởng như thế nào đối với tốc độ phản ứng và tỉ lệ chết?")
     col1, col2 = st.columns(2)
     with col1:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.barplot(data=df, x='scale', y='response_time_hours', palette='Blues_d', ci=None, ax=ax)
-        ax.set_title("DQ2.1: Response Time (Mega-event nhanh nhất!)", fontweight='bold')
-        st.pyplot(fig)
+        def draw_response_by_scale():
+            fig, ax = new_figure(figsize=(8, 5))
+            barplot_from_stats(ax, aggregates['page_stats']['response_by_scale'], 'scale', 'response_time_hours', 'Blues_d')
+            ax.set_title("DQ2.1: Response Time (Mega-event nhanh nhất!)", fontweight='bold')
+            return fig
+        show_figure('bq2_response_by_scale', draw_response_by_scale)
     with col2:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.barplot(data=df, x='scale', y='death_rate', palette='Reds_d', ci=None, ax=ax)
-        ax.set_title("DQ2.2: Death Rate (Mega-event thấp nhất!)", fontweight='bold')
-        st.pyplot(fig)
+        def draw_death_by_scale():
+            fig, ax = new_figure(figsize=(8, 5))
+            barplot_from_stats(ax, aggregates['page_stats']['death_rate_by_scale'], 'scale', 'death_rate', 'Reds_d')
+            ax.set_title("DQ2.2: Death Rate (Mega-event thấp nhất!)", fontweight='bold')
+            return fig
+        show_figure('bq2_death_by_scale', draw_death_by_scale)
     
     st.markdown("---")
     
     # DQ2.3
     st.markdown("### **DQ2.3: Quốc gia nào chiếm đa số các mega-event (>5M người)?**")
-    mega_events = df[df['scale'] == '>5M (Mega-event)']
-    top10_mega = mega_events['country'].value_counts().head(10).reset_index()
+    top10_mega = view('mega_country_counts').head(10).reset_index()
     top10_mega.columns = ['Quốc gia', 'Số sự kiện Mega']
     
-    total_mega = len(mega_events)
-    china_india_count = mega_events[mega_events['country'].isin(['China', 'India'])].shape[0]
-    percent_ci = (china_india_count / total_mega) * 100
+    mega_totals = view('mega_totals')
+    total_mega, china_india_count = mega_totals['total'], mega_totals['china_india']
+    percent_ci = (china_india_count / total_mega) * 100 if total_mega else 0.0  # Bộ lọc có thể loại hết mega-event
     
     c_d3_1, c_d3_2 = st.columns([2, 1])
     with c_d3_1:
@@ -325,7 +489,7 @@ def render_bq2():
                          text='Số sự kiện Mega', title="<b>Top 10 Quốc gia có Mega-event</b>",
                          color='Số sự kiện Mega', color_continuous_scale='Reds')
         fig_dq3.update_layout(yaxis={'categoryorder':'total ascending'})
-        st.plotly_chart(fig_dq3, use_container_width=True)
+        show_plotly('bq2_top10_mega', fig_dq3)
     with c_d3_2:
         st.warning(f"""
         **🕵️‍♂️ Thủ phạm được tìm thấy:**
@@ -342,32 +506,32 @@ def render_bq2():
     exclude_giants = st.checkbox("🛑 **Loại bỏ China & India** ra khỏi dữ liệu để kiểm chứng?", value=False)
 
     if exclude_giants:
-        df_viz = df[~df['country'].isin(['China', 'India'])]
         insight_text = "👉 **Kết quả:** Khi loại bỏ China & India -> **Nghịch lý BIẾN MẤT!** Mega-events trở nên chậm chạp đúng như quy luật thông thường."
         insight_type = st.error
     else:
-        df_viz = df
         insight_text = "👉 **Hiện tại:** Dữ liệu bao gồm China & India (Năng lực huy động 'thời chiến' cực mạnh)."
         insight_type = st.warning
 
     col3, col4 = st.columns(2)
     with col3:
-        fig, ax = plt.subplots(figsize=(8, 5))
-        sns.barplot(data=df_viz, x='scale', y='response_time_hours', palette='viridis', ci=None, ax=ax)
-        ax.set_title(f"Response Time ({'NO China/India' if exclude_giants else 'ALL'})", fontweight='bold')
-        ax.set_ylabel("Giờ")
-        st.pyplot(fig)
+        def draw_response_by_scale_viz():
+            stats_viz = aggregates['page_stats']['response_by_scale_rest' if exclude_giants else 'response_by_scale']
+            fig, ax = new_figure(figsize=(8, 5))
+            barplot_from_stats(ax, stats_viz, 'scale', 'response_time_hours', 'viridis')
+            ax.set_title(f"Response Time ({'NO China/India' if exclude_giants else 'ALL'})", fontweight='bold')
+            ax.set_ylabel("Giờ")
+            return fig
+        show_figure('bq2_response_by_scale_viz', draw_response_by_scale_viz, exclude_giants=exclude_giants)
     
     with col4:
         insight_type(insight_text)
         if not exclude_giants:
-            china_india_df = df[df['country'].isin(['China', 'India'])].assign(group='China & India')
-            others_df = df[~df['country'].isin(['China', 'India'])].assign(group='Rest of World')
-            comp_df = pd.concat([china_india_df, others_df])
-            
-            fig, ax = plt.subplots(figsize=(8, 3.5))
-            sns.boxplot(data=comp_df, x='response_time_hours', y='group', palette='magma', ax=ax)
-            st.pyplot(fig)
+            def draw_giants_vs_world():
+                fig, ax = new_figure(figsize=(8, 3.5))
+                boxplot_from_stats(ax, aggregates['page_stats']['response_by_giant_group'], 'magma',
+                                   'response_time_hours', 'group', orient='h')
+                return fig
+            show_figure('bq2_giants_vs_world', draw_giants_vs_world)
             st.caption("China & India nhanh hơn thế giới trung bình 36%.")
 
     st.info("🚀 **ACTION:** Thế giới cần học mô hình 'Mega-event Response' và chuyển giao công nghệ từ China/India.")
@@ -383,6 +547,8 @@ def render_bq2():
             navigate_to('Conclusion')
 
 def render_conclusion():
+    import plotly.express as px
+
     st.markdown("# 🏁 Tổng Kết & Khuyến Nghị Chiến Lược")
     st.markdown("### *Bức tranh toàn cảnh: Từ dữ liệu đến hành động thực tiễn*")
 
@@ -399,14 +565,17 @@ def render_conclusion():
     st.subheader("📊 Ma Trận Hiệu Quả Quốc Gia (Performance Matrix)")
     st.markdown("*Trục X: Tốc độ (Càng trái càng tốt) | Trục Y: Tỷ lệ chết (Càng thấp càng tốt)*")
 
-    country_perf = df.groupby(['country', 'dev_status', 'continent']).agg({
-        'response_time_hours': 'mean',
-        'death_rate': 'mean',
-        'event_id': 'count',
-        'economic_impact_million_usd': 'sum'
-    }).reset_index()
+    country_perf = view('country_perf').reset_index()
+    country_perf = country_perf.rename(columns={
+        'response_time_hours_mean': 'response_time_hours',
+        'death_rate_mean': 'death_rate',
+        'n': 'event_id',
+        'economic_impact_million_usd_sum': 'economic_impact_million_usd'
+    })[['country', 'dev_status', 'continent', 'response_time_hours', 'death_rate',
+        'event_id', 'economic_impact_million_usd']]
     
     country_perf = country_perf[country_perf['event_id'] > 5]
+    country_perf = top_n_points(country_perf, 'event_id')
 
     fig_matrix = px.scatter(
         country_perf, 
@@ -423,7 +592,7 @@ def render_conclusion():
     
     fig_matrix.add_vline(x=24, line_dash="dash", line_color="red", annotation_text="Ngưỡng 24h")
     fig_matrix.update_traces(textposition='top center')
-    st.plotly_chart(fig_matrix, use_container_width=True)
+    show_plotly('conclusion_matrix', fig_matrix)
 
     st.success("**🎯 Góc lý tưởng:** Góc dưới bên trái (Nhanh & Chết ít).")
 
@@ -449,18 +618,62 @@ def render_conclusion():
     if st.button("🔄 Quay về Trang chủ", type="secondary", use_container_width=True):
         navigate_to('Overview')
 
+# --- ĐO HIỆU NĂNG (DEBUG) ---
+def request_profile():
+    # on_click chạy trước lần rerun do chính nút bấm gây ra -> profile đúng lần đó
+    st.session_state['profile_next'] = st.session_state.get('debug_profiler', PROFILERS[0])
+
+def render_debug_panel():
+    with st.sidebar.expander("⏱️ Hiệu năng lần chạy này"):
+        st.caption(f"Tổng {profile.elapsed * 1000:,.0f} ms · RSS {rss_bytes() / 2**20:,.0f} MB "
+                   f"(+{(rss_bytes() - profile.rss_start) / 2**20:,.1f}) · peak {peak_rss_bytes() / 2**20:,.0f} MB")
+        summary = pd.DataFrame(profile.summary(), columns=['kind', 'name', 'calls', 'seconds', 'rss_delta'])
+        summary = summary.assign(ms=summary['seconds'] * 1000, rss_mb=summary['rss_delta'] / 2**20)
+        st.dataframe(summary.sort_values('ms', ascending=False)[['kind', 'name', 'calls', 'ms', 'rss_mb']],
+                     hide_index=True, use_container_width=True)
+        st.dataframe(summary.groupby('kind')['ms'].sum().sort_values(ascending=False).reset_index(),
+                     hide_index=True, use_container_width=True)
+
+        st.selectbox("Profiler", PROFILERS, key="debug_profiler")
+        st.button("📸 Chạy lại trang có profile", on_click=request_profile)
+        if 'profile_report' in st.session_state:
+            st.code(st.session_state['profile_report'], language='text')
+        if st.checkbox("Prometheus metrics (cả process)", key="debug_metrics"):
+            st.code(METRICS.prometheus_text(), language='text')
+        if snapshot.has_rows and st.checkbox("Bộ nhớ RowStore theo cột", key="debug_memory"):
+            report = snapshot.table.memory_report()
+            st.caption(f"{report['bytes'].sum() / 2**20:,.2f} MB · "
+                       f"{report['bytes'].sum() / max(snapshot.rows, 1):,.1f} byte/dòng")
+            st.dataframe(report, use_container_width=True)
+
+def finish_rerun():
+    METRICS.count_rerun()
+    profile.log(page=st.session_state['current_page'], data_version=data_version, filters=len(view_key))
+    if METRICS_FILE:
+        METRICS.write_textfile(METRICS_FILE)
+    if DEBUG:
+        render_debug_panel()
+
 # --- 4. ROUTING ---
-if df is not None:
-    # Đồng bộ Sidebar Radio với Session State
-    # (Đã xử lý ở phần Sidebar đầu file)
-    
-    if st.session_state['current_page'] == 'Overview':
-        render_overview()
-    elif st.session_state['current_page'] == 'BQ1':
-        render_bq1()
-    elif st.session_state['current_page'] == 'BQ2':
-        render_bq2()
-    elif st.session_state['current_page'] == 'Conclusion':
-        render_conclusion()
+if snapshot is not None:
+    st.session_state['chart_timings'] = profile.laps
+    engine_name = st.session_state.pop('profile_next', None) if DEBUG else None
+    capture = ProfileCapture(engine_name).start() if engine_name else None
+    try:
+        # Đồng bộ Sidebar Radio với Session State
+        # (Đã xử lý ở phần Sidebar đầu file)
+
+        if st.session_state['current_page'] == 'Overview':
+            render_overview()
+        elif st.session_state['current_page'] == 'BQ1':
+            render_bq1()
+        elif st.session_state['current_page'] == 'BQ2':
+            render_bq2()
+        elif st.session_state['current_page'] == 'Conclusion':
+            render_conclusion()
+    finally:
+        if capture is not None:
+            st.session_state['profile_report'] = capture.stop()
+    finish_rerun()
 else:
     st.stop()
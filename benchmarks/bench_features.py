@@ -0,0 +1,37 @@
+"""Benchmark cho bước derive_features: thời gian phải tăng tuyến tính theo số dòng.
+
+Chạy từ thư mục gốc:  python -m benchmarks.bench_features --sizes 100000 1000000 10000000
+"""
+import argparse
+import time
+
+from benchmarks.synthetic import make_events
+from data_pipeline import derive_features, load_country_attributes
+
+
+def time_derive(n_rows, country_table, repeat=3):
+    base = make_events(n_rows)
+    best = float('inf')
+    for _ in range(repeat):
+        df = base.copy()
+        start = time.perf_counter()
+        derive_features(df, country_table)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', type=int, nargs='+', default=[100_000, 1_000_000, 10_000_000])
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+
+    country_table = load_country_attributes()
+    print(f"{'rows':>12} {'seconds':>10} {'ns/row':>10}")
+    for n_rows in args.sizes:
+        seconds = time_derive(n_rows, country_table, args.repeat)
+        print(f"{n_rows:>12,} {seconds:>10.3f} {seconds / n_rows * 1e9:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
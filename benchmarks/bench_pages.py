@@ -0,0 +1,262 @@
+"""Benchmark nạp dữ liệu và từng trang dashboard trên dữ liệu giả lập nhiều kích thước.
+
+Với mỗi kích thước: sinh CSV theo schema thật (cache trong .bench_data/), rồi chạy
+mỗi pha trong một process con riêng để peak RSS không cộng dồn giữa các pha:
+  - load:  data_pipeline.load_and_process_data (đọc CSV + derive feature)
+  - pages: từng trang render_* qua AppTest (không cần trình duyệt), lần đầu (cold)
+           và lần chạy lại (warm), kèm thời gian từng biểu đồ (perf.RerunProfile)
+  - store: bảng RowStore ở dạng đầy đủ (int64 + cột tỉ lệ) và dạng gọn: bộ nhớ,
+           thời gian/kích thước khi pickle và khi ghi segment Arrow
+
+Kết quả ghi ra JSON để so sánh giữa các commit (--compare file_cu.json).
+
+Chạy từ thư mục gốc:
+  python -m benchmarks.bench_pages --rows 3000,100000,1000000
+  python -m benchmarks.bench_pages --rows 10000000 --phases pages --chunk-rows 500000
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import subprocess
+import sys
+import time
+
+from benchmarks.synthetic import make_events, write_events_csv
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_PATH = os.path.join(ROOT, 'app.py')
+DATA_DIR = os.path.join(ROOT, '.bench_data')
+RESULTS_DIR = os.path.join(ROOT, 'benchmarks', 'results')
+PAGES = ['Overview', 'BQ1', 'BQ2', 'Conclusion']
+PHASES = ['load', 'pages', 'store']
+STORE_MODES = {'wide': False, 'compact': True}
+DEFAULT_ROWS = [3_000, 100_000, 1_000_000]
+GENERATE_BATCH = 1_000_000  # Sinh CSV lớn theo lô để không giữ 10M dòng trong RAM
+
+
+def peak_rss_mb():
+    # ru_maxrss: KB trên Linux, bytes trên macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 2**20 if sys.platform == 'darwin' else peak / 1024
+
+
+def synthetic_csv(n_rows, seed=0):
+    """Đường dẫn CSV giả lập n_rows dòng; chỉ sinh lại khi chưa có trong .bench_data/."""
+    os.makedirs(DATA_DIR, exist_ok=True)
+    path = os.path.join(DATA_DIR, f'events_{n_rows}_{seed}.csv')
+    if os.path.exists(path):
+        return path
+
+    partial = path + '.tmp'
+    for start in range(0, n_rows, GENERATE_BATCH):
+        size = min(GENERATE_BATCH, n_rows - start)
+        df = make_events(size, seed=seed + start, first_id=start)
+        if start:
+            with open(partial, 'a') as f:
+                write_events_csv(df, f, header=False)
+        else:
+            write_events_csv(df, partial)
+    os.replace(partial, path)
+    return path
+
+
+# --- CÁC PHA ĐO (CHẠY TRONG PROCESS CON) ---
+def run_load(csv_path, chunk_rows):
+    from data_pipeline import load_and_process_data
+
+    start = time.perf_counter()
+    df = load_and_process_data(csv_path)
+    return {'seconds': time.perf_counter() - start, 'rows': len(df)}
+
+
+def _run_page(at, page):
+    at.session_state['current_page'] = page
+    start = time.perf_counter()
+    at.run()
+    elapsed = time.perf_counter() - start
+    if at.exception:
+        raise RuntimeError(f'{page}: {at.exception[0].value}')
+    return elapsed, dict(at.session_state['chart_timings'])
+
+
+def run_pages(csv_path, chunk_rows):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ['DASHBOARD_DATA_FILE'] = csv_path
+    os.environ['DASHBOARD_CHUNK_ROWS'] = str(chunk_rows or 0)
+    pages = {}
+    for page in PAGES:
+        # Session mới cho mỗi trang; cache_resource/cache_data dùng chung cả process
+        at = AppTest.from_file(APP_PATH, default_timeout=3600)
+        cold, _ = _run_page(at, page)
+        warm, charts = _run_page(at, page)
+        pages[page] = {'cold_seconds': cold, 'warm_seconds': warm, 'charts': charts}
+    return {'pages': pages}
+
+
+def run_store(csv_path, chunk_rows):
+    import pickle
+
+    from data_pipeline import load_and_process_data, memory_report
+    from data_store import STORE_COLUMNS, pa, store_frame
+
+    modes = {}
+    for mode, compact in STORE_MODES.items():
+        frame = store_frame(load_and_process_data(csv_path, columns=STORE_COLUMNS), compact)
+        start = time.perf_counter()
+        blob = pickle.dumps(frame, protocol=pickle.HIGHEST_PROTOCOL)
+        stats = {'memory_bytes': int(memory_report(frame)['bytes'].sum()),
+                 'pickle_seconds': time.perf_counter() - start, 'pickle_bytes': len(blob)}
+        del blob
+        if pa is not None:
+            path = os.path.join(DATA_DIR, f'store_{mode}_{os.getpid()}.arrow')
+            start = time.perf_counter()
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+            stats.update(arrow_seconds=time.perf_counter() - start, arrow_bytes=os.path.getsize(path))
+            os.remove(path)
+        modes[mode] = stats
+    return {'modes': modes}
+
+
+PHASE_RUNNERS = {'load': run_load, 'pages': run_pages, 'store': run_store}
+
+
+def run_worker(phase, n_rows, chunk_rows):
+    csv_path = synthetic_csv(n_rows)
+    start = time.perf_counter()
+    result = PHASE_RUNNERS[phase](csv_path, chunk_rows)
+    result.update(wall_seconds=time.perf_counter() - start, peak_rss_mb=peak_rss_mb())
+    return result
+
+
+def spawn_worker(phase, n_rows, chunk_rows):
+    cmd = [sys.executable, '-m', 'benchmarks.bench_pages', '--worker', phase,
+           '--rows', str(n_rows), '--chunk-rows', str(chunk_rows or 0)]
+    proc = subprocess.run(cmd, cwd=ROOT, capture_output=True, text=True)
+    if proc.returncode != 0:
+        return {'error': proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else 'failed'}
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+# --- BÁO CÁO & SO SÁNH ---
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return 'unknown'
+
+
+def flatten(report):
+    """{(rows, metric): giá trị} cho mọi số đo -> so sánh hai file kết quả."""
+    out = {}
+    for run in report['runs']:
+        rows = run['rows']
+        if 'load' in run and 'seconds' in run['load']:
+            out[(rows, 'load.seconds')] = run['load']['seconds']
+            out[(rows, 'load.peak_rss_mb')] = run['load']['peak_rss_mb']
+        pages = run.get('pages', {})
+        for page, stats in pages.get('pages', {}).items():
+            out[(rows, f'{page}.cold_seconds')] = stats['cold_seconds']
+            out[(rows, f'{page}.warm_seconds')] = stats['warm_seconds']
+            for chart, seconds in stats['charts'].items():
+                out[(rows, f'{page}.chart.{chart}')] = seconds
+        if 'peak_rss_mb' in pages:
+            out[(rows, 'pages.peak_rss_mb')] = pages['peak_rss_mb']
+        for mode, stats in run.get('store', {}).get('modes', {}).items():
+            for metric, value in stats.items():
+                out[(rows, f'store.{mode}.{metric}')] = value
+    return out
+
+
+def print_report(report):
+    for run in report['runs']:
+        print(f"\n== {run['rows']:,} dòng ==")
+        load = run.get('load')
+        if load:
+            if 'error' in load:
+                print(f"  load: LỖI {load['error']}")
+            else:
+                print(f"  load_and_process_data: {load['seconds']:.3f}s  peak RSS {load['peak_rss_mb']:.0f} MB")
+        pages = run.get('pages')
+        if pages:
+            if 'error' in pages:
+                print(f"  pages: LỖI {pages['error']}")
+                continue
+            print(f"  pages: peak RSS {pages['peak_rss_mb']:.0f} MB")
+            for page, stats in pages['pages'].items():
+                slowest = sorted(stats['charts'].items(), key=lambda kv: -kv[1])[:3]
+                detail = ', '.join(f'{name} {seconds * 1000:.0f}ms' for name, seconds in slowest)
+                print(f"  {page:>11}: cold {stats['cold_seconds']:.3f}s  warm {stats['warm_seconds']:.3f}s"
+                      f"  | chậm nhất: {detail}")
+        store = run.get('store')
+        if store:
+            if 'error' in store:
+                print(f"  store: LỖI {store['error']}")
+                continue
+            for mode, stats in store['modes'].items():
+                arrow = (f"  arrow {stats['arrow_seconds']:.3f}s / {stats['arrow_bytes'] / 2**20:.1f} MB"
+                         if 'arrow_bytes' in stats else '')
+                print(f"  store {mode:>7}: RAM {stats['memory_bytes'] / 2**20:.1f} MB"
+                      f"  pickle {stats['pickle_seconds']:.3f}s / {stats['pickle_bytes'] / 2**20:.1f} MB{arrow}")
+
+
+def print_comparison(old_report, new_report):
+    old, new = flatten(old_report), flatten(new_report)
+    print(f"\n== So sánh {old_report['commit']} -> {new_report['commit']} ==")
+    for key in sorted(old.keys() & new.keys()):
+        before, after = old[key], new[key]
+        change = (after - before) / before * 100 if before else 0.0
+        print(f'  {key[0]:>10,} {key[1]:<45} {before:>10.3f} -> {after:>10.3f} ({change:+.1f}%)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--rows', default=','.join(map(str, DEFAULT_ROWS)),
+                        help='Danh sách kích thước, vd. 3000,100000,1000000,10000000')
+    parser.add_argument('--phases', default=','.join(PHASES))
+    parser.add_argument('--chunk-rows', type=int, default=0,
+                        help='> 0: chạy trang ở chế độ streaming (DASHBOARD_CHUNK_ROWS)')
+    parser.add_argument('--out', help='File JSON kết quả (mặc định benchmarks/results/<commit>.json)')
+    parser.add_argument('--compare', help='File JSON của lần chạy trước để in chênh lệch')
+    parser.add_argument('--worker', choices=PHASES, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.worker:
+        print(json.dumps(run_worker(args.worker, int(args.rows), args.chunk_rows)))
+        return
+
+    phases = args.phases.split(',')
+    report = {
+        'commit': git_commit(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'chunk_rows': args.chunk_rows,
+        'runs': [],
+    }
+    for n_rows in (int(value) for value in args.rows.split(',')):
+        synthetic_csv(n_rows)  # Sinh dữ liệu trước để không tính vào thời gian đo
+        run = {'rows': n_rows}
+        for phase in phases:
+            run[phase] = spawn_worker(phase, n_rows, args.chunk_rows)
+        report['runs'].append(run)
+
+    print_report(report)
+    out = args.out or os.path.join(RESULTS_DIR, f"{report['commit']}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(report, f, indent=1)
+    print(f'\nĐã ghi {out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            print_comparison(json.load(f), report)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Mô phỏng N session Streamlit đồng thời và đo RSS của process sau mỗi session.
+
+Mỗi session là một AppTest riêng (session_state riêng) được giữ sống tới cuối,
+giống N tab trình duyệt đang mở. Với kho dữ liệu dùng chung, RSS tăng thêm cho
+mỗi session phải gần như phẳng.
+
+Chạy từ thư mục gốc:  python -m benchmarks.bench_sessions --sessions 20
+"""
+import argparse
+import os
+import resource
+import time
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+PAGES = ['Overview', 'BQ1', 'BQ2', 'Conclusion']
+
+
+def rss_mb():
+    # RSS hiện tại (Linux); nơi khác dùng peak RSS của getrusage
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2**20
+    except OSError:
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def main():
+    from streamlit.testing.v1 import AppTest
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=20)
+    args = parser.parse_args()
+
+    sessions = []
+    baseline = rss_mb()
+    after_first = None
+    print(f"{'session':>8} {'page':>11} {'seconds':>8} {'rss_mb':>8} {'delta_mb':>9}")
+    previous = baseline
+    for i in range(args.sessions):
+        page = PAGES[i % len(PAGES)]
+        at = AppTest.from_file(APP_PATH, default_timeout=600)
+        at.session_state['current_page'] = page
+        start = time.perf_counter()
+        at.run()
+        elapsed = time.perf_counter() - start
+        if at.exception:
+            raise RuntimeError(at.exception[0].value)
+        sessions.append(at)
+        current = rss_mb()
+        print(f'{i + 1:>8} {page:>11} {elapsed:>8.3f} {current:>8.1f} {current - previous:>9.2f}')
+        previous = current
+        if after_first is None:
+            after_first = current
+
+    print(f'\nSession đầu (import + nạp dữ liệu): {after_first - baseline:.1f} MB')
+    if len(sessions) > 1:
+        per_session = (rss_mb() - after_first) / (len(sessions) - 1)
+        print(f'Mỗi session thêm: {per_session:.2f} MB (trung bình {len(sessions) - 1} session sau)')
+
+
+if __name__ == '__main__':
+    main()
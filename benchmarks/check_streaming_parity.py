@@ -0,0 +1,241 @@
+"""Kiểm tra chế độ streaming (DASHBOARD_CHUNK_ROWS > 0) cho ra đúng các KPI & biểu đồ như chế độ in-memory.
+
+Kèm theo: aggregates của tập con chọn từ cube/partition (restrict_aggregates) phải
+khớp với tính lại trên đúng các dòng đó (cả khi CSV có ô trống), và RowStore gọn (DASHBOARD_COMPACT=1)
+cho ra đúng các trang như RowStore đầy đủ, cả khi có bộ lọc sidebar.
+
+Chạy từ thư mục gốc:  python -m benchmarks.check_streaming_parity --chunk-rows 700
+Thoát với mã 1 nếu có khác biệt.
+"""
+import argparse
+import base64
+import json
+import os
+import sys
+import tempfile
+
+import numpy as np
+import pandas as pd
+
+from aggregates import (
+    AGGREGATE_COLUMNS, CORR_COLS, CUBE_MEASURES, GIANTS, VIEW_MEASURES, StreamingAggregator, box_stats_row,
+    build_rollup_cube, giant_groups, query_cube, restrict_aggregates
+)
+from data_pipeline import DATA_FILE, derive_features, iter_csv_typed, load_country_attributes, read_csv_typed
+from spatial import MAX_ZOOM, SpatialIndex
+
+APP_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'app.py')
+PAGES = ['Overview', 'BQ1', 'BQ2', 'Conclusion']
+# Tập con lọc theo chiều partition (mọi cột của bộ lọc sidebar)
+SUBSETS = [
+    {'continent': ['Asia'], 'year': [2021, 2022, 2023, 2024]},
+    {'country': ['China', 'India', 'Japan']},
+    {'event_type': ['Flood'], 'dev_status': ['Developed']},
+    {'severity': [3, 4, 5, 6, 7, 8], 'event_type': ['Flood', 'Drought']},
+]
+# Cột số thực bị xoá trắng ở mỗi `step` dòng khi kiểm tra giá trị thiếu: {cột: step}
+BLANK_COLUMNS = {'international_aid_million_usd': 7, 'economic_impact_million_usd': 13,
+                 'infrastructure_damage_score': 10}
+# Bộ lọc sidebar áp lên từng trang khi so sánh RowStore gọn/đầy đủ: (loại widget, key, giá trị)
+FILTER_CASES = {
+    'none': [],
+    'continent': [('multiselect', 'filter_continent', ['Asia'])],
+    'severity': [('slider', 'filter_severity', (3, 8))],
+}
+
+
+# Bản tham chiếu: tính thẳng trên các dòng trong bộ nhớ (app không dùng, chỉ để so sánh)
+def group_stats(values, groups, whis=1.5):
+    """box_stats_row của từng nhóm, tính trên đúng các dòng của nhóm (bỏ qua NaN)."""
+    groups = pd.Series(groups).astype('category').reset_index(drop=True)
+    values = pd.Series(values).reset_index(drop=True).to_numpy(dtype='float64')
+    codes = groups.cat.codes.to_numpy()
+    valid = (codes >= 0) & ~np.isnan(values)
+    rows = [box_stats_row(*np.unique(values[valid & (codes == i)], return_counts=True), whis=whis)
+            for i in range(len(groups.cat.categories))]
+    index = pd.CategoricalIndex(groups.cat.categories, categories=groups.cat.categories, name=groups.name)
+    return pd.DataFrame(rows, index=index)
+
+
+def build_page_stats(df):
+    rest = ~df['country'].isin(GIANTS)
+    return {
+        'death_rate_by_response_bin': group_stats(df['death_rate'], df['response_bin']),
+        'response_by_dev_status': group_stats(df['response_time_hours'], df['dev_status']),
+        'response_by_scale': group_stats(df['response_time_hours'], df['scale']),
+        'death_rate_by_scale': group_stats(df['death_rate'], df['scale']),
+        'response_by_scale_rest': group_stats(df.loc[rest, 'response_time_hours'], df.loc[rest, 'scale']),
+        'response_by_giant_group': group_stats(
+            df['response_time_hours'], pd.Series(giant_groups(df), name='group')
+        ),
+    }
+
+
+def build_aggregates(df):
+    """Mọi bảng các trang cần, tính từ bảng đầy đủ trong bộ nhớ."""
+    return {
+        'cube': build_rollup_cube(df),
+        'page_stats': build_page_stats(df),
+        'corr': df[CORR_COLS].corr(),
+        'spatial': SpatialIndex.from_rows(df),
+    }
+
+
+def stream_aggregates(csv_path, chunk_rows, country_table):
+    """Đọc CSV theo từng chunk qua StreamingAggregator (như DataStore); bộ nhớ đỉnh tỉ lệ với chunk_rows."""
+    aggregator = StreamingAggregator()
+    for chunk in iter_csv_typed(csv_path, chunk_rows):
+        aggregator.update(derive_features(chunk, country_table, AGGREGATE_COLUMNS))
+    return aggregator.result()
+
+
+def _diff_aggregates(expected, actual, prefix=''):
+    problems = []
+    if not np.allclose(expected['corr'].to_numpy(), actual['corr'].to_numpy(), equal_nan=True):
+        problems.append(f'{prefix}corr')
+    for name, exp in expected['page_stats'].items():
+        act = actual['page_stats'][name]
+        if list(exp.index) != list(act.index):
+            problems.append(f'{prefix}page_stats[{name}].index')
+        for col in act.columns:
+            if col in ('fliers', 'flier_counts'):
+                same = all(np.array_equal(e, a) for e, a in zip(exp[col], act[col]))
+            else:
+                same = np.allclose(exp[col].astype(float), act[col].astype(float), equal_nan=True)
+            if not same:
+                problems.append(f'{prefix}page_stats[{name}].{col}')
+    if 'spatial' in actual:
+        for zoom in (0, MAX_ZOOM):
+            exp, act = expected['spatial'].query(zoom=zoom), actual['spatial'].query(zoom=zoom)
+            if exp.shape != act.shape or not np.allclose(exp.to_numpy(), act.to_numpy()):
+                problems.append(f'{prefix}spatial[zoom={zoom}]')
+    return problems
+
+
+def _diff_cube(df, cube, measures, prefix=''):
+    # Mean/var từ cube phải khớp pandas trên dòng gốc (cả hai đều bỏ qua NaN)
+    problems = []
+    by = 'response_bin'
+    actual = query_cube(cube, by=by, measures=measures)
+    grouped = df.groupby(by, observed=True)
+    for m in measures:
+        for stat in ('mean', 'var'):
+            expected = getattr(grouped[m], stat)().reindex(actual.index)
+            if not np.allclose(expected.to_numpy(dtype=float), actual[f'{m}_{stat}'].to_numpy(dtype=float),
+                               equal_nan=True):
+                problems.append(f'{prefix}cube.{m}_{stat}')
+    return problems
+
+
+def compare_aggregates(csv_path, chunk_rows):
+    """So sánh từng bảng tổng hợp (toàn bộ và các tập con SUBSETS); trả về danh sách khác biệt."""
+    table = load_country_attributes()
+    df = derive_features(read_csv_typed(csv_path), table)
+    actual = stream_aggregates(csv_path, chunk_rows, table)
+    problems = _diff_aggregates(build_aggregates(df), actual) + _diff_cube(df, actual['cube'], CUBE_MEASURES)
+
+    for i, where in enumerate(SUBSETS):
+        mask = np.ones(len(df), dtype=bool)
+        for column, values in where.items():
+            mask &= df[column].isin(values).to_numpy()
+        subset = df[mask].reset_index(drop=True)
+        restricted = restrict_aggregates(actual, where)
+        if restricted['cube']['n'].sum() != len(subset):
+            problems.append(f'subset{i}.rows')
+        problems += _diff_aggregates(build_aggregates(subset), restricted, prefix=f'subset{i}.')
+        problems += _diff_cube(subset, restricted['cube'], VIEW_MEASURES, prefix=f'subset{i}.')
+    return problems
+
+
+def write_with_blanks(csv_path, out_path):
+    """Bản sao của CSV với ô trống ở các cột BLANK_COLUMNS (schema cho phép thiếu ở mọi cột số thực)."""
+    raw = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+    for column, step in BLANK_COLUMNS.items():
+        raw.loc[raw.index % step == 0, column] = ''
+    raw.to_csv(out_path, index=False)
+    return out_path
+
+
+def compare_missing_values(csv_path, chunk_rows):
+    """compare_aggregates trên bản sao có ô trống (write_with_blanks)."""
+    with tempfile.TemporaryDirectory() as folder:
+        blank_csv = write_with_blanks(csv_path, os.path.join(folder, 'blanks.csv'))
+        return [f'blanks.{problem}' for problem in compare_aggregates(blank_csv, chunk_rows)]
+
+
+def _normalize(value):
+    # Plotly mã hoá mảng số thành base64 ('bdata'); tổng cộng theo thứ tự khác nhau chỉ lệch ở ulp cuối
+    if isinstance(value, dict) and 'bdata' in value:
+        value = np.frombuffer(base64.b64decode(value['bdata']), dtype=value['dtype']).tolist()
+    if isinstance(value, dict):
+        return {k: _normalize(v) for k, v in value.items()}
+    if isinstance(value, list):
+        return [_normalize(v) for v in value]
+    if isinstance(value, float):
+        return float(f'{value:.9g}')
+    return value
+
+
+def _page_outputs(page, env, filters=()):
+    from streamlit.testing.v1 import AppTest
+
+    os.environ.update(env)
+    at = AppTest.from_file(APP_PATH, default_timeout=600)
+    at.session_state['current_page'] = page
+    at.run()
+    for widget, key, value in filters:
+        getattr(at, widget)(key=key).set_value(value).run()
+    return {
+        'exceptions': [str(e.value) for e in at.exception],
+        'metrics': [(m.label, m.value) for m in at.metric],
+        'alerts': [a.value for a in [*at.success, *at.warning, *at.error, *at.info]],
+        'plotly': _normalize([json.loads(c.proto.spec)['data'] for c in at.get('plotly_chart')]),
+    }
+
+
+def _diff_outputs(expected, actual, prefix):
+    return [f'{prefix}.{key}' for key in ('exceptions', 'metrics', 'alerts', 'plotly')
+            if expected[key] != actual[key]]
+
+
+def compare_pages(chunk_rows):
+    problems = []
+    for page in PAGES:
+        expected = _page_outputs(page, {'DASHBOARD_CHUNK_ROWS': '0'})
+        actual = _page_outputs(page, {'DASHBOARD_CHUNK_ROWS': str(chunk_rows)})
+        problems += _diff_outputs(expected, actual, page)
+    os.environ.pop('DASHBOARD_CHUNK_ROWS', None)
+    return problems
+
+
+def compare_compact():
+    """RowStore gọn và đầy đủ (DASHBOARD_COMPACT=1/0) phải cho cùng kết quả trên mọi trang & FILTER_CASES."""
+    problems = []
+    for page in PAGES:
+        for case, filters in FILTER_CASES.items():
+            expected = _page_outputs(page, {'DASHBOARD_COMPACT': '0'}, filters)
+            actual = _page_outputs(page, {'DASHBOARD_COMPACT': '1'}, filters)
+            problems += _diff_outputs(expected, actual, f'compact.{page}.{case}')
+    os.environ.pop('DASHBOARD_COMPACT', None)
+    return problems
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=DATA_FILE)
+    parser.add_argument('--chunk-rows', type=int, default=700)
+    parser.add_argument('--skip-pages', action='store_true', help='chỉ so sánh bảng tổng hợp, không chạy AppTest')
+    args = parser.parse_args()
+
+    problems = compare_aggregates(args.csv, args.chunk_rows) + compare_missing_values(args.csv, args.chunk_rows)
+    if not args.skip_pages:
+        problems += compare_pages(args.chunk_rows) + compare_compact()
+    if problems:
+        print('KHÁC BIỆT:', ', '.join(problems))
+        sys.exit(1)
+    print(f'OK: streaming (chunk_rows={args.chunk_rows}) khớp với in-memory'
+          + ('' if args.skip_pages else ', RowStore gọn khớp với đầy đủ'))
+
+
+if __name__ == '__main__':
+    main()
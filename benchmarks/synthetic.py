@@ -0,0 +1,64 @@
+# --- SINH DỮ LIỆU GIẢ LẬP THEO SCHEMA CỦA FILE CSV (DÙNG CHO BENCHMARK) ---
+import numpy as np
+import pandas as pd
+
+from data_pipeline import DATE_FORMAT, RAW_SCHEMA
+
+COUNTRIES = [
+    'Argentina', 'Australia', 'Austria', 'Bangladesh', 'Belgium', 'Brazil', 'Canada', 'Chile', 'China',
+    'Colombia', 'Czech Republic', 'Denmark', 'Egypt', 'Finland', 'France', 'Germany', 'Greece', 'Hungary',
+    'India', 'Indonesia', 'Iraq', 'Ireland', 'Israel', 'Italy', 'Japan', 'Kazakhstan', 'Malaysia', 'Mexico',
+    'Netherlands', 'New Zealand', 'Nigeria', 'Pakistan', 'Peru', 'Philippines', 'Poland', 'Portugal', 'Qatar',
+    'Romania', 'Russia', 'Saudi Arabia', 'Singapore', 'South Africa', 'South Korea', 'Sweden', 'Switzerland',
+    'Thailand', 'Turkey', 'UAE', 'United Kingdom', 'United States', 'Vietnam'
+]
+EVENT_TYPES = [
+    'Tsunami', 'Hurricane', 'Drought', 'Heatwave', 'Wildfire', 'Cold Wave',
+    'Earthquake', 'Landslide', 'Hailstorm', 'Volcanic Eruption', 'Flood', 'Tornado'
+]
+
+
+def make_events(n_rows, seed=0, first_id=0):
+    """Bảng sự kiện giả lập n_rows dòng, cùng cột & dtype với data_pipeline.read_csv_typed.
+
+    `first_id`: số thứ tự của event_id đầu tiên (sinh nhiều lô nối tiếp không trùng id).
+    """
+    rng = np.random.default_rng(seed)
+    date = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 6 * 365, n_rows), unit='D')
+    affected = rng.lognormal(11, 2.2, n_rows).astype('int64') + 500
+    deaths = rng.poisson(3, n_rows)
+    injuries = rng.poisson(15, n_rows)
+    impact = np.round(rng.lognormal(0, 1.5, n_rows), 2)
+    aid = np.where(rng.random(n_rows) < 0.05, np.round(impact * 0.1, 2), 0.0)
+
+    df = pd.DataFrame({
+        'event_id': np.char.add('EV', np.char.zfill(np.arange(first_id, first_id + n_rows).astype(str), 8)),
+        'date': date,
+        'year': date.year.astype('int64'),
+        'month': date.month.astype('int64'),
+        'country': pd.Categorical.from_codes(rng.integers(0, len(COUNTRIES), n_rows), categories=COUNTRIES),
+        'event_type': pd.Categorical.from_codes(rng.integers(0, len(EVENT_TYPES), n_rows),
+                                                categories=EVENT_TYPES),
+        'severity': rng.integers(1, 10, n_rows),
+        'duration_days': rng.integers(1, 90, n_rows),
+        'affected_population': affected,
+        'deaths': deaths,
+        'injuries': injuries,
+        'economic_impact_million_usd': impact,
+        'infrastructure_damage_score': np.round(rng.uniform(0, 10, n_rows), 1),
+        'response_time_hours': rng.integers(0, 60, n_rows),
+        'international_aid_million_usd': aid,
+        'latitude': np.round(rng.uniform(-90, 90, n_rows), 4),
+        'longitude': np.round(rng.uniform(-180, 180, n_rows), 4),
+        'total_casualties': deaths + injuries,
+        'impact_per_capita': np.round(impact * 1e6 / affected, 2),
+        'aid_percentage': np.where(impact > 0, np.round(aid / np.maximum(impact, 1e-9) * 100, 2), 0.0),
+    })
+    return df
+
+
+def write_events_csv(df, path_or_buffer, **kwargs):
+    out = df.copy()
+    out['date'] = out['date'].dt.strftime(DATE_FORMAT)
+    out[list(RAW_SCHEMA)].to_csv(path_or_buffer, index=False, **kwargs)
+    return path_or_buffer
@@ -0,0 +1,87 @@
+# --- VẼ BIỂU ĐỒ TỪ BẢN TÓM TẮT THỐNG KÊ (aggregates.box_stats_row) ---
+import pandas as pd
+
+BOX_LINE_COLOR = '.26'
+BOX_SATURATION = 0.75  # mặc định saturation của seaborn
+
+
+def barplot_from_stats(ax, stats, x, y, palette):
+    import seaborn as sns
+
+    # Mỗi nhóm một dòng (giá trị mean) -> cột cao bằng đúng trung bình nhóm như sns.barplot(ci=None)
+    data = pd.DataFrame({x: stats.index, y: stats['mean'].to_numpy()})
+    sns.barplot(data=data, x=x, y=y, hue=x, palette=palette, legend=False, dodge=False, ax=ax)
+    return ax
+
+
+def boxplot_from_stats(ax, stats, palette, x, y, orient='v'):
+    """Boxplot kiểu seaborn nhưng dùng tứ phân vị/râu/outlier đã tính sẵn.
+
+    `orient='v'`: nhóm nằm trên trục x (giá trị là `y`); `'h'` thì ngược lại.
+    """
+    import seaborn as sns
+
+    colors = sns.color_palette(palette, len(stats))
+    bxp_stats, positions, face_colors = [], [], []
+    for pos, (label, row) in enumerate(stats.iterrows()):
+        if not row['count']:
+            continue
+        bxp_stats.append({
+            'label': str(label), 'med': row['median'], 'q1': row['q1'], 'q3': row['q3'],
+            'whislo': row['whislo'], 'whishi': row['whishi'], 'fliers': row['fliers'],
+        })
+        positions.append(pos)
+        face_colors.append(sns.desaturate(colors[pos], BOX_SATURATION))
+
+    line = {'color': BOX_LINE_COLOR}
+    artists = ax.bxp(
+        bxp_stats, positions=positions, widths=0.8,
+        orientation='vertical' if orient == 'v' else 'horizontal',
+        patch_artist=True, manage_ticks=False,
+        boxprops={'edgecolor': BOX_LINE_COLOR}, medianprops=line, whiskerprops=line, capprops=line,
+        flierprops={'marker': 'o', 'markerfacecolor': 'none', 'markeredgecolor': BOX_LINE_COLOR},
+    )
+    for box, color in zip(artists['boxes'], face_colors):
+        box.set_facecolor(color)
+
+    ticks = list(range(len(stats)))
+    labels = [str(label) for label in stats.index]
+    if orient == 'v':
+        ax.set_xticks(ticks, labels)
+        ax.set_xlim(-0.5, len(stats) - 0.5)
+    else:
+        ax.set_yticks(ticks, labels)
+        ax.set_ylim(len(stats) - 0.5, -0.5)  # Giống seaborn: nhóm đầu tiên ở trên cùng
+    ax.set_xlabel(x)
+    ax.set_ylabel(y)
+    return ax
+
+
+# --- GIẢM DỮ LIỆU PHÍA SERVER TRƯỚC KHI GỬI CHO st.plotly_chart ---
+# Số điểm tối đa mỗi biểu đồ gửi xuống trình duyệt (payload không tăng theo số sự kiện)
+POINT_BUDGETS = {
+    'category_bar': 15,
+    'scatter': 150,
+    'map_points': 2000,
+}
+OTHER_LABEL = 'Khác'
+
+
+def top_n_with_other(frame, label, value, n=None, other_label=OTHER_LABEL):
+    """Giữ n-1 nhóm lớn nhất, gộp phần còn lại thành một dòng 'Khác' (chỉ khi vượt n)."""
+    n = n or POINT_BUDGETS['category_bar']
+    if len(frame) <= n:
+        return frame
+    frame = frame.sort_values(value, ascending=False, kind='stable')
+    head, tail = frame.iloc[:n - 1], frame.iloc[n - 1:]
+    other = pd.DataFrame({label: [other_label], value: [tail[value].sum()]})
+    return pd.concat([head, other], ignore_index=True)
+
+
+def top_n_points(frame, size, n=None):
+    # Scatter theo thực thể (quốc gia...): chỉ vẽ n điểm có trọng số lớn nhất, giữ thứ tự ban đầu
+    n = n or POINT_BUDGETS['scatter']
+    if len(frame) <= n:
+        return frame
+    return frame.loc[frame[size].nlargest(n).index.sort_values()]
+
@@ -0,0 +1,292 @@
+# --- TẦNG ĐỌC DỮ LIỆU (KHÔNG PHỤ THUỘC STREAMLIT) ---
+import csv
+import io
+import os
+
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:  # Không có pyarrow: không dùng sidecar Parquet, luôn đọc CSV
+    pa = pq = None
+
+DATA_FILE = 'global_climate_events_economic_impact_2020_2025.csv'
+COUNTRY_TABLE_FILE = 'country_attributes.csv'
+DATE_FORMAT = '%m/%d/%Y'
+# Khoá metadata của sidecar Parquet: kích thước & mtime_ns của file CSV lúc được đọc
+SOURCE_KEY = b'dashboard.source'
+
+# Schema cố định của file CSV -> pandas không phải đoán kiểu dữ liệu mỗi lần đọc
+RAW_SCHEMA = {
+    'event_id': str,
+    'date': str,
+    'year': 'int64',
+    'month': 'int64',
+    'country': 'category',
+    'event_type': 'category',
+    'severity': 'int64',
+    'duration_days': 'int64',
+    'affected_population': 'int64',
+    'deaths': 'int64',
+    'injuries': 'int64',
+    'economic_impact_million_usd': 'float64',
+    'infrastructure_damage_score': 'float64',
+    'response_time_hours': 'int64',
+    'international_aid_million_usd': 'float64',
+    'latitude': 'float64',
+    'longitude': 'float64',
+    'total_casualties': 'int64',
+    'impact_per_capita': 'float64',
+    'aid_percentage': 'float64',
+}
+
+
+# Bảng tra cứu cho feature: sửa file CSV/hằng số, không cần sửa logic
+DEFAULT_CONTINENT = 'Other'
+DEFAULT_DEV_STATUS = 'Developing'
+DEV_STATUS_LABELS = ['Developed', 'Developing']
+
+RESPONSE_BINS = [0, 12, 24, np.inf]
+RESPONSE_LABELS = ['<12h (Nhanh)', '12-24h (Trung bình)', '>24h (Chậm)']
+
+# Cận trên là inf (thay vì max+1) để kết quả không phụ thuộc vào từng lô dữ liệu
+SCALE_BINS = [0, 100000, 1000000, 5000000, np.inf]
+SCALE_LABELS = ['<100k', '100k–1M', '1M–5M', '>5M (Mega-event)']
+
+
+def sidecar_path(csv_path):
+    return os.path.splitext(csv_path)[0] + '.parquet'
+
+
+def read_csv_typed(csv_path, **kwargs):
+    # Đọc CSV theo schema, parse ngày với format cố định (không infer)
+    df = pd.read_csv(csv_path, dtype=RAW_SCHEMA, **kwargs)
+    return _parse_dates(df)
+
+
+def iter_csv_typed(csv_path, chunk_rows, **kwargs):
+    # Như read_csv_typed nhưng trả về từng lô chunk_rows dòng (không giữ cả file trong RAM)
+    with pd.read_csv(csv_path, dtype=RAW_SCHEMA, chunksize=chunk_rows, **kwargs) as reader:
+        for chunk in reader:
+            yield _parse_dates(chunk)
+
+
+def _parse_dates(df):
+    df['date'] = pd.to_datetime(df['date'], format=DATE_FORMAT)
+    return df
+
+
+def _source_stamp(stat):
+    return f'{stat.st_size}:{stat.st_mtime_ns}'.encode()
+
+
+def _sidecar_is_fresh(csv_path, parquet_path):
+    # So với dấu của chính file CSV đã tạo ra sidecar: mtime của sidecar không nói gì về nội dung
+    # (copy/giải nén giữ mtime cũ, đồng hồ lệch, CSV bị sửa ngay sau khi sidecar được ghi...)
+    if pq is None or not os.path.exists(parquet_path):
+        return False
+    try:
+        metadata = pq.read_schema(parquet_path).metadata or {}
+    except (OSError, ValueError):
+        return False
+    return metadata.get(SOURCE_KEY) == _source_stamp(os.stat(csv_path))
+
+
+def _write_sidecar(df, source, parquet_path):
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    metadata = {**(table.schema.metadata or {}), SOURCE_KEY: _source_stamp(source)}
+    pq.write_table(table.replace_schema_metadata(metadata), parquet_path)
+
+
+def read_events(csv_path=DATA_FILE, use_sidecar=True):
+    """Đọc bảng sự kiện thô đã gán kiểu.
+
+    Lần đầu đọc từ CSV rồi ghi file Parquet cạnh CSV; các lần sau đọc thẳng
+    từ Parquet (dạng cột, giữ nguyên dtype & category). Sidecar lưu kích thước
+    & mtime_ns của CSV nguồn; CSV không còn khớp thì sidecar bị bỏ qua và ghi lại.
+    """
+    if not os.path.exists(csv_path):
+        raise FileNotFoundError(csv_path)
+
+    parquet_path = sidecar_path(csv_path)
+    if use_sidecar and _sidecar_is_fresh(csv_path, parquet_path):
+        try:
+            return pd.read_parquet(parquet_path)
+        except (OSError, ValueError):
+            pass  # File hỏng -> đọc lại từ CSV
+
+    # stat trước khi đọc: CSV đổi trong lúc đọc thì dấu không khớp và lần sau đọc lại
+    source = os.stat(csv_path)
+    df = read_csv_typed(csv_path)
+    if use_sidecar and pq is not None:
+        try:
+            _write_sidecar(df, source, parquet_path)
+        except (OSError, ValueError):
+            pass  # Không ghi được sidecar (thư mục read-only...) thì bỏ qua
+    return df
+
+
+def read_csv_tail(csv_path, offset, columns, chunk_rows=None):
+    """Đọc các dòng được ghi thêm sau byte `offset` (chỉ lấy dòng đã kết thúc bằng newline).
+
+    Trả về (iterator các DataFrame, offset mới). File đang được ghi dở dòng cuối
+    thì dòng đó để lần refresh sau.
+    """
+    with open(csv_path, 'rb') as f:
+        f.seek(offset)
+        data = f.read()
+    end = data.rfind(b'\n') + 1
+    if end == 0:
+        return iter(()), offset
+
+    def frames():
+        buffer = io.BytesIO(data[:end])
+        # Không chia chunk thì đọc một lần: số dòng luôn <= số byte `end`
+        with pd.read_csv(buffer, header=None, names=columns, dtype=RAW_SCHEMA,
+                         chunksize=chunk_rows or end) as reader:
+            for chunk in reader:
+                yield _parse_dates(chunk)
+
+    return frames(), offset + end
+
+
+def read_header(csv_path):
+    with open(csv_path, newline='') as f:
+        return next(csv.reader(f))
+
+
+def load_and_process_data(csv_path=DATA_FILE, country_table=None, columns=None):
+    # Đọc + derive feature toàn bộ file (chế độ in-memory); `columns` như derive_features
+    return derive_features(read_events(csv_path), country_table, columns)
+
+
+# --- FEATURE ENGINEERING (VECTORIZED, TABLE-DRIVEN) ---
+def load_country_attributes(path=COUNTRY_TABLE_FILE):
+    """Đọc bảng country -> continent/dev_status. Nước không có trong bảng nhận giá trị mặc định."""
+    table = pd.read_csv(path, dtype=str).dropna(subset=['country'])
+    table = table.drop_duplicates('country', keep='last').set_index('country')
+    table['continent'] = table['continent'].fillna(DEFAULT_CONTINENT)
+    table['dev_status'] = table['dev_status'].fillna(DEFAULT_DEV_STATUS)
+    return table
+
+
+def _lookup_categorical(country, mapping, categories, default):
+    # Tra cứu theo category (vài chục giá trị) rồi nhân ra theo codes -> O(n) thuần numpy
+    cat = country.astype('category').cat
+    per_category = np.array(
+        [categories.index(mapping.get(c, default)) for c in cat.categories] + [-1],
+        dtype=np.int8
+    )
+    codes = per_category[cat.codes.to_numpy()]  # code -1 (NaN) lấy phần tử cuối = -1
+    return pd.Categorical.from_codes(codes, categories=categories)
+
+
+def _categories_from(values, default):
+    categories = list(dict.fromkeys(values))
+    if default not in categories:
+        categories.append(default)
+    return categories
+
+
+def _dev_status(df, country_table, derived):
+    dev_map = country_table['dev_status'].to_dict()
+    return _lookup_categorical(df['country'], dev_map, DEV_STATUS_LABELS, DEFAULT_DEV_STATUS)
+
+
+def _response_bin(df, country_table, derived):
+    return pd.cut(df['response_time_hours'], bins=RESPONSE_BINS, labels=RESPONSE_LABELS, include_lowest=True)
+
+
+def _per_population(column):
+    def rate(df, country_table, derived):
+        population = df['affected_population'].to_numpy(dtype='float64')
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return df[column].to_numpy() / population * 100
+    return rate
+
+
+def _continent(df, country_table, derived):
+    continent_map = country_table['continent'].to_dict()
+    continents = _categories_from(country_table['continent'], DEFAULT_CONTINENT)
+    return _lookup_categorical(df['country'], continent_map, continents, DEFAULT_CONTINENT)
+
+
+def _scale(df, country_table, derived):
+    return pd.cut(df['affected_population'], bins=SCALE_BINS, labels=SCALE_LABELS)
+
+
+def _log_impact(df, country_table, derived):
+    return np.log1p(df['economic_impact_million_usd'])
+
+
+# Cột dẫn xuất -> hàm tính, theo thứ tự cột trong bảng kết quả.
+# Không có cờ is_developed: trùng thông tin với dev_status (category 1 byte/dòng) -> dùng dev_status == 'Developed'
+FEATURES = {
+    'dev_status': _dev_status,
+    'response_bin': _response_bin,
+    'death_rate': _per_population('deaths'),
+    'injury_rate': _per_population('injuries'),
+    'continent': _continent,
+    'scale': _scale,
+    'log_impact': _log_impact,
+}
+FEATURE_COLUMNS = list(FEATURES)
+_COUNTRY_FEATURES = {'dev_status', 'continent'}
+
+
+def derive_features(df, country_table=None, columns=None):
+    """Thêm các cột dẫn xuất cho bảng sự kiện (sửa trực tiếp và trả về df).
+
+    `columns`: chỉ tính các cột dẫn xuất có trong danh sách này (mặc định: tất cả).
+    """
+    wanted = set(FEATURE_COLUMNS if columns is None else columns) & set(FEATURE_COLUMNS)
+    if country_table is None and wanted & _COUNTRY_FEATURES:
+        country_table = load_country_attributes()
+
+    derived = {}
+    for name in FEATURE_COLUMNS:
+        if name in wanted:
+            derived[name] = FEATURES[name](df, country_table, derived)
+    for name in FEATURE_COLUMNS:
+        if name in derived:
+            df[name] = derived[name]
+    return df
+
+
+# --- BIỂU DIỄN GỌN: DOWNCAST KHÔNG MẤT GIÁ TRỊ & BÁO CÁO BỘ NHỚ THEO CỘT ---
+COMPACT_INT_TYPES = ['int8', 'int16', 'int32']
+
+
+def compact_frame(df):
+    """Thu gọn bảng sự kiện (sửa trực tiếp và trả về df).
+
+    Cột số nguyên xuống kiểu nhỏ nhất chứa đủ min/max của cột nên giá trị không
+    đổi. Cột số thực giữ float64: float32 làm lệch tổng/trung bình hiển thị trên
+    trang. Cột chuỗi lặp lại (country, event_type...) vốn đã là category.
+    """
+    for column in df.columns:
+        values = df[column]
+        if not len(values) or not pd.api.types.is_integer_dtype(values.dtype) \
+                or isinstance(values.dtype, pd.CategoricalDtype):
+            continue
+        low, high = values.min(), values.max()
+        for dtype in COMPACT_INT_TYPES:
+            if np.dtype(dtype).itemsize >= values.dtype.itemsize:
+                break
+            if np.iinfo(dtype).min <= low and high <= np.iinfo(dtype).max:
+                df[column] = values.astype(dtype)
+                break
+    return df
+
+
+def memory_report(df):
+    """Số byte mỗi cột (deep: gồm cả chuỗi Python) kèm dtype và byte/dòng, cột tốn nhất trước."""
+    usage = df.memory_usage(index=False, deep=True)
+    report = pd.DataFrame({
+        'dtype': df.dtypes.astype(str),
+        'bytes': usage,
+        'bytes_per_row': usage / max(len(df), 1),
+    })
+    return report.sort_values('bytes', ascending=False)
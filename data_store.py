@@ -0,0 +1,379 @@
+# --- KHO DỮ LIỆU DÙNG CHUNG: NẠP LẦN ĐẦU, SAU ĐÓ CHỈ XỬ LÝ DÒNG MỚI GHI THÊM ---
+import hashlib
+import logging
+import os
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+from pandas.api.types import union_categoricals
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc  # noqa: F401  (đăng ký pa.ipc)
+except ImportError:  # Không có pyarrow: RowStore giữ DataFrame trong heap
+    pa = None
+
+from aggregates import AGGREGATE_COLUMNS, StreamingAggregator
+from data_pipeline import (
+    compact_frame, derive_features, iter_csv_typed, load_and_process_data, load_country_attributes,
+    read_csv_tail, read_header
+)
+from filters import FILTER_COLUMNS
+from page_views import warm_up, with_page_views
+
+logger = logging.getLogger(__name__)
+
+# Số byte dùng để nhận biết file bị ghi đè (không phải chỉ ghi thêm)
+PROBE_BYTES = 4096
+# Thư mục tạm để ghi segment Arrow trước khi memory-map (cạnh file CSV)
+CACHE_DIR = '.dashboard_cache'
+# Cột dẫn xuất được tính khi nạp: chỉ những cột aggregates & bộ lọc dùng tới
+STORE_COLUMNS = list(dict.fromkeys(AGGREGATE_COLUMNS + FILTER_COLUMNS))
+# Chế độ gọn không lưu các cột tỉ lệ: tính lại từ deaths/injuries/affected_population khi cần
+RECOMPUTED_COLUMNS = ['death_rate', 'injury_rate']
+
+
+def store_frame(frame, compact=True):
+    """Bản ghi vào RowStore (sửa trực tiếp frame: gọi sau khi đã cộng frame vào aggregates).
+
+    Chế độ gọn bỏ RECOMPUTED_COLUMNS và downcast số nguyên (compact_frame).
+    """
+    if not compact:
+        return frame
+    frame.drop(columns=RECOMPUTED_COLUMNS, inplace=True)
+    return compact_frame(frame)
+
+
+def _probe(csv_path, offset):
+    # Hash phần đầu file và đoạn ngay trước offset: đổi -> nội dung cũ đã bị sửa
+    with open(csv_path, 'rb') as f:
+        head = f.read(min(PROBE_BYTES, offset))
+        f.seek(max(0, offset - PROBE_BYTES))
+        tail = f.read(min(PROBE_BYTES, offset))
+    return hashlib.blake2b(head + tail, digest_size=16).hexdigest()
+
+
+class RowStore:
+    """Bảng dòng chỉ-đọc dùng chung cho mọi session.
+
+    Mỗi segment (lần nạp đầu + mỗi lần append) được ghi ra file Arrow IPC,
+    memory-map lại rồi xoá tên file ngay: dữ liệu nằm trong page cache của OS
+    chứ không trên heap Python, và đĩa được giải phóng khi snapshot cuối cùng
+    dùng segment đó bị thu hồi (không để lại file mồ côi). Mỗi process có bản
+    map riêng, không chia sẻ segment giữa các process. Cột số được trả về dạng view numpy
+    zero-copy; trang chỉ cần một phần dữ liệu thì dùng `take(rows, columns)`
+    với mảng chỉ số dòng thay vì copy cả bảng. Không có pyarrow thì giữ
+    DataFrame trong heap như trước.
+    """
+
+    def __init__(self, segments=()):
+        self._segments = list(segments)
+
+    def append(self, frame, folder):
+        # Trả về RowStore mới (snapshot cũ vẫn giữ danh sách segment cũ)
+        return RowStore(self._segments + [_map_segment(frame, folder)])
+
+    def __len__(self):
+        return sum(_segment_rows(seg) for seg in self._segments)
+
+    def column(self, name):
+        """Một cột cho toàn bộ dòng: numpy (zero-copy khi chỉ có 1 segment) hoặc Categorical."""
+        parts = [_segment_column(seg, name) for seg in self._segments]
+        if len(parts) == 1:
+            return parts[0]
+        if isinstance(parts[0], pd.Categorical):
+            dtype = parts[0].dtype
+            if all(p.dtype == dtype for p in parts):
+                return pd.Categorical.from_codes(np.concatenate([p.codes for p in parts]), dtype=dtype)
+            # Category thô (country...) khác nhau giữa các segment -> hợp nhất, sắp xếp như read_csv
+            return union_categoricals(parts, sort_categories=True)
+        return np.concatenate(parts)
+
+    def take(self, rows=None, columns=None):
+        """DataFrame chỉ gồm `columns` tại các vị trí `rows` (None = tất cả)."""
+        columns = columns or self.columns
+        data = {}
+        for name in columns:
+            values = self.column(name)
+            data[name] = values if rows is None else values[rows]
+        return pd.DataFrame(data)
+
+    @property
+    def columns(self):
+        seg = self._segments[0]
+        return list(seg.schema.names) if pa is not None and isinstance(seg, pa.Table) else list(seg.columns)
+
+    def memory_report(self):
+        """Số byte mỗi cột cộng trên mọi segment (Arrow: kích thước buffer), cột tốn nhất trước."""
+        sizes, dtypes = {}, {}
+        for seg in self._segments:
+            for name in self.columns:
+                if pa is not None and isinstance(seg, pa.Table):
+                    nbytes, dtype = seg.column(name).nbytes, str(seg.schema.field(name).type)
+                else:
+                    nbytes, dtype = int(seg[name].memory_usage(index=False, deep=True)), str(seg[name].dtype)
+                sizes[name] = sizes.get(name, 0) + nbytes
+                dtypes.setdefault(name, dtype)
+        report = pd.DataFrame({'dtype': pd.Series(dtypes), 'bytes': pd.Series(sizes)})
+        report['bytes_per_row'] = report['bytes'] / max(len(self), 1)
+        return report.sort_values('bytes', ascending=False)
+
+
+def _map_segment(frame, folder):
+    if pa is None:
+        return frame
+    path = None
+    try:
+        os.makedirs(folder, exist_ok=True)
+        fd, path = tempfile.mkstemp(suffix='.arrow', prefix='segment-', dir=folder)
+        os.close(fd)
+        table = pa.Table.from_pandas(frame, preserve_index=False)
+        with pa.OSFile(path, 'wb') as sink, pa.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+        return pa.ipc.open_file(pa.memory_map(path, 'r')).read_all()
+    except OSError as exc:
+        # Không ghi được segment (thư mục read-only, đầy đĩa...) -> giữ DataFrame trong heap như thiếu pyarrow
+        logger.warning('cannot memory-map a segment in %s (%s), keeping it in heap', folder, exc)
+        return frame
+    finally:
+        if path is not None:
+            _unlink(path)
+
+
+def _unlink(path):
+    # Vùng đã mmap vẫn đọc được sau khi xoá tên file (POSIX); Windows không cho xoá thì để lại
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _segment_rows(seg):
+    return seg.num_rows if pa is not None and isinstance(seg, pa.Table) else len(seg)
+
+
+def _segment_column(seg, name):
+    if pa is None or not isinstance(seg, pa.Table):
+        values = seg[name]
+        return values.array if isinstance(values.dtype, pd.CategoricalDtype) else values.to_numpy()
+    column = seg.column(name)
+    if pa.types.is_dictionary(column.type):
+        return column.to_pandas().array
+    if pa.types.is_string(column.type) or pa.types.is_large_string(column.type):
+        return column.to_pandas().to_numpy()
+    chunk = column.combine_chunks() if column.num_chunks != 1 else column.chunk(0)
+    try:
+        return chunk.to_numpy(zero_copy_only=True)  # View thẳng vào vùng nhớ mmap
+    except pa.ArrowInvalid:
+        return chunk.to_numpy(zero_copy_only=False)
+
+
+class Snapshot:
+    """Trạng thái dữ liệu tại một data version; không bị sửa sau khi publish.
+
+    `table` là RowStore dùng chung (None ở chế độ streaming); `built_at`: thời điểm publish (epoch).
+    """
+
+    def __init__(self, version, aggregates, table, rows):
+        self.version = version
+        self.aggregates = aggregates
+        self.table = table
+        self.rows = rows
+        self.built_at = time.time()
+
+    @property
+    def has_rows(self):
+        return self.table is not None
+
+
+class DataStore:
+    """Giữ dữ liệu + aggregates cho cả process và làm mới theo kiểu append.
+
+    `refresh()` chỉ os.stat file; nếu file dài thêm và phần đã đọc không đổi thì
+    chỉ parse phần đuôi mới, derive feature và cộng vào aggregates. File bị
+    cắt ngắn/ghi đè thì nạp lại toàn bộ. Mỗi lần dữ liệu đổi, `version` đổi
+    theo để các cache phía sau (figure cache...) tự vô hiệu.
+    `chunk_rows` > 0: chế độ streaming, không giữ dòng thô.
+    `warmup_workers` > 1: trước khi publish, tính song song aggregates của mọi
+    trang trên thread pool; snapshot mới chỉ hiện ra khi đã tính xong.
+    `compact`: RowStore lưu số nguyên đã downcast và bỏ các cột tỉ lệ tính lại được.
+    """
+
+    def __init__(self, csv_path, chunk_rows=None, warmup_workers=None, compact=True):
+        self.csv_path = csv_path
+        self.chunk_rows = chunk_rows
+        self.compact = compact
+        # Thread (không phải process): view đọc chung cube trong bộ nhớ, groupby của pandas nhả GIL
+        self._executor = ThreadPoolExecutor(warmup_workers, thread_name_prefix='warmup') \
+            if warmup_workers and warmup_workers > 1 else None
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._offset = 0
+        self._mtime_ns = None
+        self._probe = None
+        self._columns = None
+        self._aggregator = None
+        self._country_table = None
+        self.full_loads = 0
+        self.appends = 0
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def close(self):
+        # Giải phóng thread pool warm-up; snapshot đã publish vẫn đọc được
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+
+    def refresh(self):
+        """Đồng bộ với file nguồn và trả về snapshot hiện tại."""
+        stat = os.stat(self.csv_path)  # FileNotFoundError để trang hiển thị lỗi
+        if self._snapshot is not None and stat.st_size == self._offset \
+                and stat.st_mtime_ns == self._mtime_ns:
+            return self._snapshot
+
+        with self._lock:
+            stat = os.stat(self.csv_path)
+            if self._snapshot is None or stat.st_size < self._offset \
+                    or _probe(self.csv_path, self._offset) != self._probe:
+                self._full_load()
+            elif stat.st_size > self._offset:
+                self._append()
+            elif stat.st_mtime_ns != self._mtime_ns:
+                # Cùng kích thước, mtime đổi: bị ghi đè tại chỗ ngoài vùng probe, không có dòng mới để append
+                self._full_load()
+            return self._snapshot
+
+    def _full_load(self):
+        self._country_table = load_country_attributes()
+        self._columns = read_header(self.csv_path)
+        aggregator = StreamingAggregator()
+        df = None
+        while True:
+            before = os.stat(self.csv_path)
+            if self.chunk_rows:
+                for chunk in iter_csv_typed(self.csv_path, self.chunk_rows):
+                    aggregator.update(derive_features(chunk, self._country_table, STORE_COLUMNS))
+            else:
+                df = load_and_process_data(self.csv_path, self._country_table, STORE_COLUMNS)
+                aggregator.update(df)
+            after = os.stat(self.csv_path)
+            if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+                break
+            aggregator, df = StreamingAggregator(), None  # File đổi trong lúc đọc -> đọc lại
+
+        table = None
+        if df is not None:
+            table = RowStore().append(store_frame(df, self.compact), self._segment_dir())
+
+        # Ghi nhận sau cùng: lỗi ở trên thì lần refresh sau vẫn nạp lại, không rơi vào nhánh "không đổi"
+        self._aggregator = aggregator
+        self._offset, self._mtime_ns = after.st_size, after.st_mtime_ns
+        self._probe = _probe(self.csv_path, self._offset)
+        self.full_loads += 1
+        self._publish(table)
+
+    def _append(self):
+        start = self._offset
+        frames, offset = read_csv_tail(self.csv_path, start, self._columns, self.chunk_rows)
+        if offset == start:
+            return  # Chưa có dòng hoàn chỉnh nào mới (đang ghi dở)
+        # Cộng vào bản sao: chunk nào lỗi thì trạng thái cũ còn nguyên, lần sau đọc lại từ `start`
+        aggregator = self._aggregator.copy()
+        table = self._snapshot.table
+        for chunk in frames:
+            chunk = derive_features(chunk, self._country_table, STORE_COLUMNS)
+            aggregator.update(chunk)
+            if table is not None:
+                table = table.append(store_frame(chunk, self.compact), self._segment_dir())
+
+        self._aggregator = aggregator
+        self._offset = offset
+        self._mtime_ns = os.stat(self.csv_path).st_mtime_ns
+        self._probe = _probe(self.csv_path, self._offset)
+        self.appends += 1
+        self._publish(table)
+
+    def _publish(self, table):
+        # Snapshot mới thay thế nguyên khối; session đang đọc snapshot cũ không bị ảnh hưởng
+        version = f'{self._offset}-{self._mtime_ns}'
+        aggregates = with_page_views(self._aggregator.result())
+        if self._executor is not None:
+            warm_up(aggregates, self._executor)
+        self._snapshot = Snapshot(version, aggregates, table, self._aggregator.rows)
+
+    def _segment_dir(self):
+        return os.path.join(os.path.dirname(os.path.abspath(self.csv_path)), CACHE_DIR)
+
+
+# --- DỊCH VỤ NỀN: NẠP & LÀM MỚI NGOÀI THREAD CHẠY SCRIPT CỦA STREAMLIT ---
+class DataService:
+    """Chạy DataStore.refresh() trên một thread nền; trang chỉ đọc snapshot đã publish.
+
+    Lần rerun nào cũng chỉ đánh thức thread (`request_refresh`) rồi dùng ngay
+    snapshot tốt gần nhất: nạp lại/append/warm-up chậm không chặn người dùng,
+    snapshot mới hiện ra ở lần chạy sau. Ngoài ra thread tự kiểm tra file mỗi
+    `interval` giây. Chỉ lần nạp đầu tiên (chưa có snapshot nào) là phải chờ.
+    Lỗi khi làm mới được giữ ở `error`, snapshot cũ vẫn tiếp tục được dùng.
+    `stop()` kết thúc thread (sau lần làm mới đang chạy) và đóng DataStore.
+    """
+
+    def __init__(self, store, interval=60):
+        self.store = store
+        self.interval = interval
+        self.error = None
+        self.checked_at = None
+        self.refreshing = False
+        self._wake = threading.Event()
+        self._stopped = threading.Event()
+        self._first_attempt = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='data-service', daemon=True)
+        self._thread.start()
+
+    @property
+    def snapshot(self):
+        return self.store.snapshot
+
+    def request_refresh(self):
+        # Không chờ: thread nền kiểm tra file ngay khi rảnh
+        self._wake.set()
+
+    def wait_first(self, timeout=None):
+        """Chờ lần nạp đầu kết thúc; trả về snapshot (None nếu lần đó lỗi)."""
+        self._first_attempt.wait(timeout)
+        return self.snapshot
+
+    def stop(self, wait=False):
+        """Yêu cầu thread nền dừng; `wait`: chờ tới khi thread (và lần làm mới đang chạy) kết thúc."""
+        self._stopped.set()
+        self._wake.set()
+        if wait:
+            self._thread.join()
+
+    def _run(self):
+        try:
+            while not self._stopped.is_set():
+                self._wake.clear()
+                self.refreshing = True
+                try:
+                    self.store.refresh()
+                    self.error = None
+                except Exception as exc:  # Giữ snapshot cũ; trang hiển thị lỗi qua `error`
+                    self.error = exc
+                    if not isinstance(exc, FileNotFoundError):
+                        logger.exception('background refresh failed for %s', self.store.csv_path)
+                finally:
+                    self.refreshing = False
+                    self.checked_at = time.time()
+                    self._first_attempt.set()
+                self._wake.wait(self.interval)
+        finally:
+            # Đóng ở chính thread này: không shutdown thread pool khi warm-up còn đang dùng
+            self.store.close()
+            self._first_attempt.set()
+
@@ -0,0 +1,79 @@
+# --- CACHE HÌNH MATPLOTLIB/SEABORN ĐÃ RENDER (BYTES PNG/SVG, LRU) ---
+import io
+import threading
+from collections import OrderedDict
+
+# Giống mặc định của st.pyplot để ảnh cache hiển thị y hệt
+SAVEFIG_DEFAULTS = {'bbox_inches': 'tight', 'dpi': 200}
+
+
+def render_figure(fig, fmt='png'):
+    """Xuất figure ra bytes rồi đóng figure (tránh rò bộ nhớ của pyplot)."""
+    import matplotlib.pyplot as plt
+
+    try:
+        buffer = io.BytesIO()
+        fig.savefig(buffer, format=fmt, **SAVEFIG_DEFAULTS)
+        return buffer.getvalue()
+    finally:
+        plt.close(fig)
+
+
+class FigureCache:
+    """LRU cache cho ảnh đã render, giới hạn theo tổng số bytes.
+
+    Key nên gồm chart id, data version và các tham số ảnh hưởng tới hình
+    (vd. toggle exclude_giants). Dùng chung giữa các session nên có lock.
+    """
+
+    def __init__(self, max_bytes=64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._size = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        with self._lock:
+            data = self._entries.get(key)
+            if data is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return data
+
+    def put(self, key, data):
+        if len(data) > self.max_bytes:
+            return  # Ảnh lớn hơn cả giới hạn thì không cache
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._size -= len(old)
+            self._entries[key] = data
+            self._size += len(data)
+            while self._size > self.max_bytes:
+                _, evicted = self._entries.popitem(last=False)
+                self._size -= len(evicted)
+
+    def get_or_render(self, key, draw, fmt='png'):
+        # draw() trả về figure; chỉ được gọi khi chưa có trong cache
+        full_key = (fmt, key)
+        data = self.get(full_key)
+        if data is None:
+            data = render_figure(draw(), fmt)
+            self.put(full_key, data)
+        return data
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._size = 0
+
+    @property
+    def size_bytes(self):
+        return self._size
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,104 @@
+# --- BẢNG TỔNG HỢP CỦA TỪNG TRANG (TRUY VẤN CUBE), TÍNH TRƯỚC SONG SONG KHI DỮ LIỆU ĐỔI ---
+import logging
+from concurrent.futures import wait
+
+from aggregates import query_cube, ranked_counts
+from data_pipeline import RESPONSE_LABELS, SCALE_LABELS
+
+logger = logging.getLogger(__name__)
+
+MEGA = {'scale': SCALE_LABELS[-1]}
+
+
+def kpi_totals(aggregates):
+    return query_cube(aggregates['cube'], measures=['economic_impact_million_usd', 'affected_population',
+                                                    'response_time_hours']).iloc[0]
+
+
+def impact_by_country(aggregates):
+    return query_cube(aggregates['cube'], by='country', measures=['economic_impact_million_usd'])
+
+
+def event_type_counts(aggregates):
+    return ranked_counts(aggregates['cube'], 'event_type')
+
+
+def country_counts(aggregates):
+    return ranked_counts(aggregates['cube'], 'country')
+
+
+def death_rate_fast_slow(aggregates):
+    # <=24h tương ứng đúng 2 nhóm response_bin đầu tiên
+    cube = aggregates['cube']
+    return {
+        'fast': query_cube(cube, measures=['death_rate'],
+                           where={'response_bin': RESPONSE_LABELS[:2]})['death_rate_mean'].iloc[0],
+        'slow': query_cube(cube, measures=['death_rate'],
+                           where={'response_bin': RESPONSE_LABELS[2:]})['death_rate_mean'].iloc[0],
+    }
+
+
+def infra_by_response_bin(aggregates):
+    return query_cube(aggregates['cube'], by='response_bin', measures=['infrastructure_damage_score'],
+                      observed=False)
+
+
+def mega_country_counts(aggregates):
+    return ranked_counts(aggregates['cube'], 'country', where=MEGA)
+
+
+def mega_totals(aggregates):
+    cube = aggregates['cube']
+    return {
+        'total': int(query_cube(cube, where=MEGA)['n'].iloc[0]),
+        'china_india': int(query_cube(cube, where={**MEGA, 'country': ['China', 'India']})['n'].iloc[0]),
+    }
+
+
+def country_perf(aggregates):
+    return query_cube(aggregates['cube'], by=['country', 'dev_status', 'continent'],
+                      measures=['response_time_hours', 'death_rate', 'economic_impact_million_usd'])
+
+
+def world_density(aggregates):
+    # Khung nhìn mặc định (toàn cầu) của bản đồ mật độ: (mức zoom, các ô có sự kiện)
+    index = aggregates['spatial']
+    zoom = index.zoom_for((-90, 90), (-180, 180))
+    return zoom, index.query(zoom=zoom)
+
+
+# Tên view -> hàm(aggregates); kết quả dùng chung giữa các session nên trang không được sửa tại chỗ
+PAGE_VIEWS = {
+    'kpi_totals': kpi_totals,
+    'impact_by_country': impact_by_country,
+    'event_type_counts': event_type_counts,
+    'country_counts': country_counts,
+    'death_rate_fast_slow': death_rate_fast_slow,
+    'infra_by_response_bin': infra_by_response_bin,
+    'mega_country_counts': mega_country_counts,
+    'mega_totals': mega_totals,
+    'country_perf': country_perf,
+    'world_density': world_density,
+}
+
+
+def with_page_views(aggregates):
+    return aggregates.with_views(PAGE_VIEWS)
+
+
+def _build(aggregates, key):
+    try:
+        aggregates[key]
+    except Exception:
+        # Không chặn việc publish; trang truy cập key này sẽ tính lại và báo lỗi như bình thường
+        logger.exception('warm-up failed for %s', key)
+
+
+def warm_up(aggregates, executor):
+    """Tính mọi key của aggregates song song trên executor và chờ tới khi xong hết.
+
+    Key phụ thuộc nhau (view cần 'cube'/'page_stats') không tính lặp: lock theo key
+    của LazyAggregates khiến thread tới sau chờ kết quả của thread đang tính.
+    """
+    wait([executor.submit(_build, aggregates, key) for key in aggregates])
+    return aggregates
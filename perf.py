@@ -0,0 +1,179 @@
+# --- ĐO HIỆU NĂNG: THỜI GIAN & BỘ NHỚ TỪNG BƯỚC TRONG MỘT LẦN CHẠY SCRIPT ---
+import cProfile
+import io
+import json
+import logging
+import os
+import pstats
+import resource
+import sys
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    from pyinstrument import Profiler as _PyinstrumentProfiler
+except ImportError:
+    _PyinstrumentProfiler = None
+
+logger = logging.getLogger('dashboard.perf')
+
+PROFILERS = ['cProfile'] + (['pyinstrument'] if _PyinstrumentProfiler is not None else [])
+
+
+def rss_bytes():
+    # RSS hiện tại (Linux, rẻ: một lần đọc /proc); nơi khác dùng peak RSS
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return peak_rss_bytes()
+
+
+def peak_rss_bytes():
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak if sys.platform == 'darwin' else peak * 1024
+
+
+class RerunProfile:
+    """Số đo của một lần chạy script: các span (tên, loại, giây, RSS tăng thêm) và lap.
+
+    - `span(name, kind)`: đo đúng một khối code (đọc CSV, groupby, vẽ...).
+    - `lap(name)`: số giây kể từ mốc trước -> mỗi biểu đồ gồm cả truy vấn cube
+      và dựng figure ngay phía trên nó.
+    """
+
+    def __init__(self):
+        self.spans = []
+        self.laps = {}
+        self.started = time.perf_counter()
+        self.rss_start = rss_bytes()
+        self._mark = self.started
+
+    @contextmanager
+    def span(self, name, kind):
+        # kind: 'load' (đọc dữ liệu), 'aggregate' (groupby/cube), 'render' (seaborn), 'serialize' (Plotly)
+        rss_before = rss_bytes()
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            seconds = time.perf_counter() - start
+            self.spans.append({'name': name, 'kind': kind, 'seconds': seconds,
+                               'rss_delta': rss_bytes() - rss_before})
+            METRICS.observe(kind, name, seconds)
+
+    def lap(self, name):
+        now = time.perf_counter()
+        self.laps[name] = self.laps.get(name, 0.0) + now - self._mark
+        self._mark = now
+        return self.laps[name]
+
+    @property
+    def elapsed(self):
+        return time.perf_counter() - self.started
+
+    def summary(self):
+        """Gộp span theo (loại, tên): số lần gọi, tổng giây, tổng RSS tăng thêm."""
+        groups = {}
+        for span in self.spans:
+            entry = groups.setdefault((span['kind'], span['name']),
+                                      {'calls': 0, 'seconds': 0.0, 'rss_delta': 0})
+            entry['calls'] += 1
+            entry['seconds'] += span['seconds']
+            entry['rss_delta'] += span['rss_delta']
+        return [{'kind': kind, 'name': name, **entry} for (kind, name), entry in groups.items()]
+
+    def log(self, **context):
+        # Một dòng JSON cho mỗi lần chạy (bật bằng logging level DEBUG của 'dashboard.perf')
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(json.dumps({
+                'event': 'rerun', **context,
+                'seconds': round(self.elapsed, 6),
+                'rss_bytes': rss_bytes(),
+                'peak_rss_bytes': peak_rss_bytes(),
+                'spans': [{**span, 'seconds': round(span['seconds'], 6)} for span in self.spans],
+                'laps': {name: round(seconds, 6) for name, seconds in self.laps.items()},
+            }, ensure_ascii=False))
+
+
+class MetricsRegistry:
+    """Bộ đếm cộng dồn cho cả process (mọi session), xuất dạng text của Prometheus."""
+
+    def __init__(self):
+        self._count = defaultdict(int)
+        self._seconds = defaultdict(float)
+        self._reruns = 0
+        self._lock = threading.Lock()
+
+    def observe(self, kind, name, seconds):
+        with self._lock:
+            self._count[(kind, name)] += 1
+            self._seconds[(kind, name)] += seconds
+
+    def count_rerun(self):
+        with self._lock:
+            self._reruns += 1
+
+    def prometheus_text(self):
+        with self._lock:
+            items = sorted(self._count.items())
+            seconds = dict(self._seconds)
+            reruns = self._reruns
+        lines = [
+            '# HELP dashboard_reruns_total Script reruns since process start.',
+            '# TYPE dashboard_reruns_total counter',
+            f'dashboard_reruns_total {reruns}',
+            '# HELP dashboard_span_seconds Time spent in instrumented steps.',
+            '# TYPE dashboard_span_seconds summary',
+        ]
+        for (kind, name), count in items:
+            labels = f'kind="{kind}",name="{name}"'
+            lines.append(f'dashboard_span_seconds_sum{{{labels}}} {seconds[(kind, name)]:.6f}')
+            lines.append(f'dashboard_span_seconds_count{{{labels}}} {count}')
+        lines += [
+            '# HELP process_resident_memory_bytes Resident memory size in bytes.',
+            '# TYPE process_resident_memory_bytes gauge',
+            f'process_resident_memory_bytes {rss_bytes()}',
+            '# HELP dashboard_peak_resident_memory_bytes Peak resident memory size in bytes.',
+            '# TYPE dashboard_peak_resident_memory_bytes gauge',
+            f'dashboard_peak_resident_memory_bytes {peak_rss_bytes()}',
+        ]
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, path):
+        # Ghi nguyên tử (cho textfile collector của node_exporter)
+        tmp = f'{path}.{os.getpid()}.tmp'
+        with open(tmp, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp, path)
+
+
+METRICS = MetricsRegistry()
+
+
+class ProfileCapture:
+    """Chạy cProfile (hoặc pyinstrument nếu đã cài) cho một khối code, trả về báo cáo text."""
+
+    def __init__(self, engine='cProfile'):
+        self.engine = engine
+        self._profiler = None
+
+    def start(self):
+        if self.engine == 'pyinstrument':
+            self._profiler = _PyinstrumentProfiler()
+            self._profiler.start()
+        else:
+            self._profiler = cProfile.Profile()
+            self._profiler.enable()
+        return self
+
+    def stop(self, limit=30):
+        if self.engine == 'pyinstrument':
+            self._profiler.stop()
+            return self._profiler.output_text(unicode=True)
+        self._profiler.disable()
+        out = io.StringIO()
+        pstats.Stats(self._profiler, stream=out).sort_stats('cumulative').print_stats(limit)
+        return out.getvalue()
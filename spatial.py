@@ -0,0 +1,140 @@
+# --- CHỈ MỤC KHÔNG GIAN: LƯỚI LAT/LONG NHIỀU MỨC ZOOM, ĐẾM & THIỆT HẠI GOM SẴN THEO Ô ---
+import threading
+
+import numpy as np
+import pandas as pd
+
+from charts import POINT_BUDGETS
+
+SPATIAL_MEASURES = ['deaths', 'economic_impact_million_usd']
+SPATIAL_COLUMNS = ['latitude', 'longitude'] + SPATIAL_MEASURES
+# Mức z chia thế giới thành lưới đều cạnh BASE_CELL / 2**z độ (z=0: 4x8 ô, z=7: ~0.35°, cỡ 40 km)
+BASE_CELL = 45.0
+MAX_ZOOM = 7
+
+
+def cell_size(zoom):
+    return BASE_CELL / 2 ** zoom
+
+
+def grid_shape(zoom):
+    # (số hàng theo vĩ độ, số cột theo kinh độ)
+    return 4 * 2 ** zoom, 8 * 2 ** zoom
+
+
+def _cell_keys(lat, lon, zoom):
+    n_rows, n_cols = grid_shape(zoom)
+    cell = cell_size(zoom)
+    rows = np.clip(np.floor((lat + 90) / cell), 0, n_rows - 1).astype(np.int64)
+    cols = np.clip(np.floor((lon + 180) / cell), 0, n_cols - 1).astype(np.int64)
+    return rows * n_cols + cols
+
+
+def _sum_by_key(keys, counts, sums):
+    # Gom các ô trùng key; kết quả sắp theo key (để tra khung nhìn bằng searchsorted)
+    unique, inverse = np.unique(keys, return_inverse=True)
+    return {
+        'key': unique,
+        'count': np.bincount(inverse, weights=counts, minlength=len(unique)).astype(np.int64),
+        'sums': np.column_stack([np.bincount(inverse, weights=sums[:, j], minlength=len(unique))
+                                 for j in range(sums.shape[1])]).reshape(len(unique), sums.shape[1]),
+    }
+
+
+class SpatialIndex:
+    """Kim tự tháp lưới: mỗi mức zoom giữ các ô có sự kiện (key, count, tổng SPATIAL_MEASURES).
+
+    Chỉ mức mịn nhất (MAX_ZOOM) được tính từ dòng; mức thô hơn gom 2x2 ô của mức
+    kế tiếp (O(số ô)) ở lần truy vấn đầu. `query()` chỉ duyệt các ô nằm trong
+    khung nhìn nên pan/zoom tốn thời gian theo số ô hiển thị, không theo số sự kiện.
+    Gộp được (`merge`) để cộng dần theo chunk như cube.
+    """
+
+    def __init__(self, finest):
+        self._levels = {MAX_ZOOM: finest}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_rows(cls, df):
+        lat = df['latitude'].to_numpy(dtype='float64')
+        lon = df['longitude'].to_numpy(dtype='float64')
+        valid = ~(np.isnan(lat) | np.isnan(lon))
+        sums = np.nan_to_num(df[SPATIAL_MEASURES].to_numpy(dtype='float64')[valid])
+        keys = _cell_keys(lat[valid], lon[valid], MAX_ZOOM)
+        return cls(_sum_by_key(keys, np.ones(len(keys)), sums))
+
+    @classmethod
+    def merge(cls, parts):
+        finest = [p.level(MAX_ZOOM) for p in parts if p is not None]
+        return cls(_sum_by_key(np.concatenate([f['key'] for f in finest]),
+                               np.concatenate([f['count'] for f in finest]),
+                               np.concatenate([f['sums'] for f in finest])))
+
+    def level(self, zoom):
+        with self._lock:
+            return self._level(zoom)
+
+    def _level(self, zoom):
+        if zoom not in self._levels:
+            finer = self._level(zoom + 1)
+            fine_cols = grid_shape(zoom + 1)[1]
+            rows, cols = finer['key'] // fine_cols, finer['key'] % fine_cols
+            keys = (rows // 2) * grid_shape(zoom)[1] + cols // 2
+            self._levels[zoom] = _sum_by_key(keys, finer['count'], finer['sums'])
+        return self._levels[zoom]
+
+    def zoom_for(self, lat_range, lon_range, budget=None):
+        """Mức mịn nhất mà số ô (kể cả ô trống) trong khung nhìn không vượt `budget`."""
+        budget = budget or POINT_BUDGETS['map_points']
+        for zoom in range(MAX_ZOOM, 0, -1):
+            rows, col_spans = _viewport_cells(lat_range, lon_range, zoom)
+            if len(rows) * sum(hi - lo + 1 for lo, hi in col_spans) <= budget:
+                return zoom
+        return 0
+
+    def query(self, lat_range=(-90, 90), lon_range=(-180, 180), zoom=None, budget=None):
+        """Các ô có sự kiện trong khung nhìn: tâm ô (latitude, longitude), count và tổng từng measure.
+
+        `lon_range` có min > max nghĩa là khung nhìn vắt qua kinh tuyến 180°.
+        """
+        zoom = self.zoom_for(lat_range, lon_range, budget) if zoom is None else zoom
+        level = self.level(zoom)
+        n_cols = grid_shape(zoom)[1]
+        rows, col_spans = _viewport_cells(lat_range, lon_range, zoom)
+        # Mỗi hàng lưới trong khung nhìn là một đoạn key liên tục -> hai lần searchsorted
+        starts, ends = [], []
+        for lo, hi in col_spans:
+            starts.append(np.searchsorted(level['key'], rows * n_cols + lo, side='left'))
+            ends.append(np.searchsorted(level['key'], rows * n_cols + hi, side='right'))
+        picked = _ranges(np.concatenate(starts), np.concatenate(ends))
+
+        keys, cell = level['key'][picked], cell_size(zoom)
+        frame = pd.DataFrame({
+            'latitude': (keys // n_cols + 0.5) * cell - 90,
+            'longitude': (keys % n_cols + 0.5) * cell - 180,
+            'count': level['count'][picked],
+        })
+        for j, measure in enumerate(SPATIAL_MEASURES):
+            frame[measure] = level['sums'][picked, j]
+        return frame
+
+
+def _ranges(starts, ends):
+    # Nối các đoạn [start, end) thành một mảng chỉ số, không vòng lặp Python
+    lengths = ends - starts
+    offsets = np.repeat(starts - np.cumsum(lengths) + lengths, lengths)
+    return offsets + np.arange(lengths.sum())
+
+
+def _viewport_cells(lat_range, lon_range, zoom):
+    # Hàng lưới (mảng) và các đoạn cột [lo, hi] phủ khung nhìn ở mức `zoom`
+    n_rows, n_cols = grid_shape(zoom)
+    cell = cell_size(zoom)
+
+    def index(value, offset, size):
+        return int(np.clip(np.floor((value + offset) / cell), 0, size - 1))
+
+    rows = np.arange(index(min(lat_range), 90, n_rows), index(max(lat_range), 90, n_rows) + 1)
+    west, east = index(lon_range[0], 180, n_cols), index(lon_range[1], 180, n_cols)
+    col_spans = [(west, east)] if lon_range[0] <= lon_range[1] else [(west, n_cols - 1), (0, east)]
+    return rows, col_spans
@@ -0,0 +1,26 @@
+"""box_stats_row (tính từ bảng đếm giá trị) phải khớp matplotlib.cbook.boxplot_stats trên dữ liệu thô."""
+import numpy as np
+import pytest
+from matplotlib import cbook
+
+from aggregates import box_stats_row
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_box_stats_row_matches_matplotlib(seed):
+    rng = np.random.default_rng(seed)
+    # Giờ phản hồi nguyên (nhiều giá trị trùng) kèm vài giá trị rất lớn để có outlier
+    data = np.concatenate([rng.poisson(12, 300 + seed * 57), rng.integers(60, 200, 5)]).astype('float64')
+    expected = cbook.boxplot_stats(data, whis=1.5)[0]
+    row = box_stats_row(*np.unique(data, return_counts=True))
+
+    assert row['count'] == len(data)
+    for key, ref in [('mean', 'mean'), ('q1', 'q1'), ('median', 'med'), ('q3', 'q3'),
+                     ('whislo', 'whislo'), ('whishi', 'whishi')]:
+        assert row[key] == pytest.approx(expected[ref])
+    np.testing.assert_array_equal(np.repeat(row['fliers'], row['flier_counts']), np.sort(expected['fliers']))
+
+
+def test_box_stats_row_empty_group():
+    row = box_stats_row(np.array([]), np.array([], dtype='int64'))
+    assert row['count'] == 0 and np.isnan(row['median']) and len(row['fliers']) == 0
@@ -0,0 +1,84 @@
+"""DataStore chỉ đọc phần đuôi ghi thêm phải cho đúng các view như nạp lại cả file."""
+import os
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from data_pipeline import DATA_FILE
+from data_store import DataStore
+from page_views import PAGE_VIEWS
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def _assert_same(expected, actual, name):
+    if isinstance(expected, pd.DataFrame):
+        pd.testing.assert_frame_equal(expected, actual, check_exact=False, obj=name)
+    elif isinstance(expected, pd.Series):
+        pd.testing.assert_series_equal(expected, actual, check_exact=False, obj=name)
+    elif isinstance(expected, dict):
+        assert expected.keys() == actual.keys(), name
+        for key in expected:
+            _assert_same(expected[key], actual[key], f'{name}[{key}]')
+    elif isinstance(expected, tuple):
+        assert len(expected) == len(actual), name
+        for i, (exp, act) in enumerate(zip(expected, actual)):
+            _assert_same(exp, act, f'{name}[{i}]')
+    else:
+        assert actual == pytest.approx(expected, nan_ok=True), name
+
+
+@pytest.mark.parametrize('chunk_rows', [None, 97])
+def test_append_matches_full_load(chunk_rows, tmp_path, monkeypatch):
+    # Bảng thuộc tính quốc gia được đọc theo đường dẫn tương đối với thư mục gốc
+    monkeypatch.chdir(ROOT)
+    with open(DATA_FILE, 'rb') as f:
+        lines = f.read().splitlines(keepends=True)
+    header, body = lines[0], lines[1:]
+    csv_path = tmp_path / 'events.csv'
+    csv_path.write_bytes(header + b''.join(body[:1500]))
+
+    store = DataStore(str(csv_path), chunk_rows=chunk_rows)
+    store.refresh()
+    # Ghi thêm các dòng hoàn chỉnh và nửa đầu của một dòng: dòng dở phải chờ lần refresh sau
+    partial = body[2000]
+    with open(csv_path, 'ab') as f:
+        f.write(b''.join(body[1500:2000]) + partial[:20])
+    assert store.refresh().rows == 2000
+    with open(csv_path, 'ab') as f:
+        f.write(partial[20:] + b''.join(body[2001:2400]))
+    snapshot = store.refresh()
+
+    fresh = DataStore(str(csv_path), chunk_rows=chunk_rows).refresh()
+    assert snapshot.rows == fresh.rows == 2400
+    assert store.full_loads == 1 and store.appends == 2
+    for name in PAGE_VIEWS:
+        _assert_same(fresh.aggregates[name], snapshot.aggregates[name], name)
+    np.testing.assert_allclose(snapshot.aggregates['corr'].to_numpy(), fresh.aggregates['corr'].to_numpy())
+
+
+def test_same_size_rewrite_reloads(tmp_path, monkeypatch):
+    monkeypatch.chdir(ROOT)
+    with open(DATA_FILE, 'rb') as f:
+        data = f.read()
+    csv_path = tmp_path / 'events.csv'
+    csv_path.write_bytes(data)
+    store = DataStore(str(csv_path))
+    before = store.refresh()
+
+    # Sửa một chữ số ở giữa file (ngoài vùng probe), giữ nguyên kích thước, mtime mới
+    lines = data.split(b'\n')
+    middle = len(lines) // 2
+    lines[middle] = lines[middle].replace(b',2,', b',3,', 1)
+    rewritten = b'\n'.join(lines)
+    assert len(rewritten) == len(data) and rewritten != data
+    csv_path.write_bytes(rewritten)
+    stat = os.stat(csv_path)
+    os.utime(csv_path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000_000))
+
+    after = store.refresh()
+    assert store.full_loads == 2 and after.version != before.version
+    fresh = DataStore(str(csv_path)).refresh()
+    for name in PAGE_VIEWS:
+        _assert_same(fresh.aggregates[name], after.aggregates[name], name)
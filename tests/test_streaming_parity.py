@@ -0,0 +1,22 @@
+"""Streaming (cộng dồn theo chunk) phải cho đúng các bảng tổng hợp như nạp cả file vào bộ nhớ."""
+import os
+
+import pytest
+
+from benchmarks.check_streaming_parity import compare_aggregates, compare_missing_values
+from data_pipeline import DATA_FILE
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize('chunk_rows', [97, 700])
+def test_streaming_matches_in_memory(chunk_rows, monkeypatch):
+    # Đường dẫn dữ liệu trong data_pipeline là tương đối với thư mục gốc
+    monkeypatch.chdir(ROOT)
+    assert compare_aggregates(DATA_FILE, chunk_rows) == []
+
+
+def test_streaming_matches_in_memory_with_blanks(monkeypatch):
+    # Partition chỉ có dòng thiếu giá trị không được làm hỏng cả ma trận tương quan
+    monkeypatch.chdir(ROOT)
+    assert compare_missing_values(DATA_FILE, 97) == []